@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Online adaptive latency anomaly detector.
+
+Keeps EWMA mean/variance per (language, hour bucket, question_type) for each
+latency metric and flags values that are statistically significant
+regressions against that context — next to the fixed-threshold anomalies
+in process_log.py. Each event costs O(1): it updates the specific context
+plus two coarser fallback levels (language, global) that are used until the
+specific context has seen enough samples.
+
+State persists in logs/state/anomaly_detector.json, so batch runs, the
+pipeline daemon and follow mode all keep learning from where they left off:
+
+    python3 scripts/anomaly_detector.py follow logs/raw/YYYYMMDD.txt
+
+Other installations keep their state in logs/state/<installation>/.
+"""
+
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+STATE_PATH = PROJECT_ROOT / 'logs' / 'state' / 'anomaly_detector.json'
+
+# metric field -> anomaly code
+REGRESSION_CODES = {
+    'latency_ms': 'LATENCY_REGRESSION',
+    'opening_latency_ms': 'OPENING_LATENCY_REGRESSION',
+    'ai_think_ms': 'THINK_REGRESSION',
+}
+
+ALPHA = 0.05          # EWMA smoothing once warmed up (~20-event memory)
+MIN_SAMPLES = 10      # samples before a context's stats are trusted
+Z_THRESHOLD = 3.0     # standard deviations above the mean
+MIN_EXCESS_MS = 500   # ignore statistically "significant" but imperceptible jumps
+
+
+def hour_bucket(hour):
+    """Coarse visiting-hours bucket, so each context collects enough samples."""
+    if hour < 11:
+        return 'morning'
+    if hour < 14:
+        return 'midday'
+    if hour < 17:
+        return 'afternoon'
+    return 'evening'
+
+
+def context_keys(inter):
+    """Context keys from most to least specific."""
+    lang = inter.get('language') or 'unknown'
+    specific = f"{lang}|{hour_bucket(inter.get('hour') or 0)}|{inter.get('question_type') or 'General'}"
+    return [specific, f"{lang}|*|*", '*|*|*']
+
+
+def _metric_value(inter, metric):
+    value = inter.get(metric)
+    if value is None or value <= 0:
+        return None
+    return value
+
+
+class AdaptiveDetector:
+    """EWMA mean/variance per context and metric, with persisted state."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.stats = state.get('stats', {})      # {metric: {context: {n, mean, var}}}
+        self.learned = state.get('learned', {})  # {source: {interaction_id: [codes]}}
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        try:
+            with open(path) as f:
+                return cls(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+
+    def save(self, path=STATE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'stats': self.stats, 'learned': self.learned}, f, indent=1)
+
+    def score(self, inter):
+        """Return regression codes for an interaction against current stats."""
+        codes = []
+        keys = context_keys(inter)
+        for metric, code in REGRESSION_CODES.items():
+            value = _metric_value(inter, metric)
+            if value is None:
+                continue
+            metric_stats = self.stats.get(metric, {})
+            for key in keys:
+                s = metric_stats.get(key)
+                if s and s['n'] >= MIN_SAMPLES:
+                    std = math.sqrt(s['var'])
+                    excess = value - s['mean']
+                    if excess > MIN_EXCESS_MS and excess > Z_THRESHOLD * std:
+                        codes.append(code)
+                    break
+        return codes
+
+    def update(self, inter):
+        """Fold an interaction's latencies into every context level."""
+        keys = context_keys(inter)
+        for metric in REGRESSION_CODES:
+            value = _metric_value(inter, metric)
+            if value is None:
+                continue
+            metric_stats = self.stats.setdefault(metric, {})
+            for key in keys:
+                s = metric_stats.setdefault(key, {'n': 0, 'mean': 0.0, 'var': 0.0})
+                x = value
+                if s['n'] >= MIN_SAMPLES:
+                    # Winsorize so one spike cannot drag the baseline up
+                    x = min(x, s['mean'] + Z_THRESHOLD * math.sqrt(s['var']) + MIN_EXCESS_MS)
+                # Cumulative average while warming up, EWMA afterwards
+                alpha = max(ALPHA, 1.0 / (s['n'] + 1))
+                diff = x - s['mean']
+                incr = alpha * diff
+                s['mean'] += incr
+                s['var'] = (1 - alpha) * (s['var'] + diff * incr)
+                s['n'] += 1
+
+    def observe(self, inter, source):
+        """Score then learn from an interaction, exactly once per (source, id).
+
+        Re-observing an interaction (reprocessing a day, or batch after follow
+        mode) returns the codes from the first time without updating stats.
+        """
+        seen = self.learned.setdefault(source, {})
+        inter_id = inter.get('id', '')
+        if inter_id in seen:
+            return seen[inter_id]
+        if all(_metric_value(inter, m) is None for m in REGRESSION_CODES):
+            return []
+        codes = self.score(inter)
+        self.update(inter)
+        seen[inter_id] = codes
+        return codes
+
+
+def apply_adaptive_anomalies(interactions, detector, source):
+    """Add adaptive regression codes to interactions (in time order).
+
+    Incomplete interactions are skipped and not recorded as learned: their
+    latencies are still truncated while a day is being submitted or written,
+    and they are scored once they complete.
+    """
+    for inter in interactions:
+        if not inter.get('is_complete'):
+            continue
+        codes = detector.observe(inter, source)
+        if not codes:
+            continue
+        anomalies = inter.setdefault('anomalies', [])
+        for code in codes:
+            if code not in anomalies:
+                anomalies.append(code)
+        inter['is_anomaly'] = True
+        inter['anomaly_type'] = anomalies[0]
+    return interactions
+
+
+def follow(filepath, poll_s=1.0):
+    """Tail a growing raw log and flag regressions as interactions complete.
+
+    Refuses to start while the pipeline daemon is running: the daemon keeps
+    its own detector in memory and would overwrite what follow mode learns
+    (and vice versa). Submit the log to the daemon instead.
+    """
+    sys.path.insert(0, str(Path(__file__).parent))
+    from installations import partition_for
+    from process_log import group_interactions, parse_log_lines
+    from rambam_pipeline import daemon_request
+
+    filepath = Path(filepath)
+    source = filepath.stem
+    # logs/raw/<installation>/ learns into that installation's state only
+    state_path = partition_for(filepath).detector_path
+    if daemon_request('GET', '/status', timeout=2) is not None:
+        print(f"The pipeline daemon is running and owns {state_path}; "
+              f"submit the log with `python3 scripts/rambam_pipeline.py ingest {filepath}` instead.")
+        sys.exit(1)
+    detector = AdaptiveDetector.load(state_path)
+    entries = []
+    line_count = 0
+    pending = ''
+    print(f"Following {filepath} (Ctrl-C to stop)")
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            while True:
+                chunk = f.read()
+                if not chunk:
+                    time.sleep(poll_s)
+                    continue
+                pending += chunk
+                *lines, pending = pending.split('\n')
+                entries.extend(parse_log_lines(lines, line_count + 1))
+                line_count += len(lines)
+                seen = detector.learned.get(source, {})
+                # Latencies only: no translation calls for answers still streaming
+                fresh = [i for i in group_interactions(entries, translate=False)
+                         if i.get('is_complete') and i['id'] not in seen]
+                for inter in fresh:
+                    codes = detector.observe(inter, source)
+                    if codes:
+                        print(f"  {inter['time']}  {inter['language']:<8} {', '.join(codes)}  "
+                              f"latency={inter['latency_ms']}ms opening={inter.get('opening_latency_ms')}ms "
+                              f"think={inter.get('ai_think_ms')}ms")
+                if fresh:
+                    detector.save(state_path)
+    except KeyboardInterrupt:
+        detector.save(state_path)
+        print("\nStopped.")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'follow':
+        print("Usage: python3 anomaly_detector.py follow <log_file.txt>")
+        sys.exit(1)
+    follow(sys.argv[2])
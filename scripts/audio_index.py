@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Index opening-audio WAV durations and keep public/data/audio_durations.json in sync.
+
+Durations are computed from the RIFF headers only (fmt byte rate + data chunk
+size) — no audio is decoded. Results are cached by (path, size, mtime) so a
+rerun only reads headers of files that changed.
+
+    python3 scripts/audio_index.py          # sync durations, report missing audio_ids
+"""
+
+import json
+import struct
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_accumulated import write_json_atomic  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+AUDIO_DIR = PROJECT_ROOT / 'public' / 'audio'
+DURATIONS_PATH = PROJECT_ROOT / 'public' / 'data' / 'audio_durations.json'
+CACHE_PATH = PROJECT_ROOT / 'logs' / 'state' / 'audio_index_cache.json'
+
+
+def read_wav_duration_ms(path):
+    """Return the duration of a PCM WAV file in ms from its RIFF header, or None."""
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        byte_rate = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(min(chunk_size, 16))
+                if len(fmt) < 12:
+                    return None
+                byte_rate = struct.unpack('<I', fmt[8:12])[0]
+                chunk_size -= len(fmt)
+            elif chunk_id == b'data':
+                if not byte_rate:
+                    return None
+                return int(chunk_size * 1000 / byte_rate)
+            # Chunks are word-aligned
+            f.seek(chunk_size + (chunk_size & 1), 1)
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def scan_audio_durations(audio_dir=AUDIO_DIR, cache=None):
+    """Scan <audio_dir>/<lang>/<audio_id>.wav and return ({lang: {audio_id: ms}}, cache, n_read)."""
+    cache = {} if cache is None else cache
+    new_cache = {}
+    durations = {}
+    n_read = 0
+    if not audio_dir.exists():
+        return durations, new_cache, n_read
+    for lang_dir in sorted(p for p in audio_dir.iterdir() if p.is_dir()):
+        lang_durations = {}
+        for wav in lang_dir.glob('*.wav'):
+            # Opening clips are numbered by audio_id; skip anything else (e.g. Start.wav)
+            if not wav.stem.isdigit():
+                continue
+            st = wav.stat()
+            key = f"{lang_dir.name}/{wav.name}"
+            cached = cache.get(key)
+            if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+                duration = cached['duration_ms']
+            else:
+                duration = read_wav_duration_ms(wav)
+                n_read += 1
+            new_cache[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'duration_ms': duration}
+            if duration is not None:
+                lang_durations[wav.stem] = duration
+        if lang_durations:
+            durations[lang_dir.name] = dict(sorted(lang_durations.items()))
+    return durations, new_cache, n_read
+
+
+def sync_audio_durations(verbose=False):
+    """Regenerate audio_durations.json from the WAV files if anything changed.
+
+    Returns the durations map. The file is only rewritten when its content
+    would change, so unchanged trees leave no diff.
+    """
+    cache = _load_cache()
+    durations, new_cache, n_read = scan_audio_durations(AUDIO_DIR, cache)
+    if not durations:
+        # No audio on disk (e.g. data-only checkout) — keep the existing map
+        return _load_durations()
+
+    # Atomic: parallel daemon ingests read audio_durations.json while another one syncs it
+    if new_cache != cache:
+        write_json_atomic(CACHE_PATH, new_cache, indent=2, sort_keys=True)
+
+    if durations != _load_durations():
+        write_json_atomic(DURATIONS_PATH, durations, indent=2, end='\n')
+        if verbose:
+            print(f"Updated {DURATIONS_PATH.name}")
+    if verbose:
+        total = sum(len(v) for v in durations.values())
+        print(f"Audio index: {total} clips, {n_read} header(s) read")
+    return durations
+
+
+def _load_durations():
+    try:
+        with open(DURATIONS_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def find_missing_audio_ids(interactions, durations):
+    """Return {lang_key: [audio_id, ...]} for audio_ids used in logs with no audio file."""
+    missing = {}
+    for inter in interactions:
+        audio_id = str(inter.get('audio_id') or '')
+        if not audio_id:
+            continue
+        lang_key = 'he' if inter.get('language', '').startswith('he') else 'en'
+        if audio_id not in durations.get(lang_key, {}):
+            missing.setdefault(lang_key, set()).add(audio_id)
+    return {k: sorted(v, key=lambda x: (len(x), x)) for k, v in sorted(missing.items())}
+
+
+def format_missing(missing):
+    return ', '.join(f"{lang}:{audio_id}" for lang, ids in missing.items() for audio_id in ids)
+
+
+def main():
+    durations = sync_audio_durations(verbose=True)
+    processed_dir = PROJECT_ROOT / 'logs' / 'processed'
+    interactions = []
+    for f in sorted(processed_dir.glob('*.json')):
+        with open(f, 'r', encoding='utf-8') as fh:
+            interactions.extend(json.load(fh).get('interactions', []))
+    missing = find_missing_audio_ids(interactions, durations)
+    if missing:
+        print(f"  ! audio_id(s) seen in logs with no audio file: {format_missing(missing)}")
+        sys.exit(2)
+    print("  All audio_ids seen in logs have audio files.")
+
+
+if __name__ == '__main__':
+    main()
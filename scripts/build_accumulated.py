@@ -1,37 +1,194 @@
 #!/usr/bin/env python3
-"""Merge all processed log JSONs into a single accumulated.json for the dashboard."""
+"""Merge all processed log JSONs into a single accumulated.json for the dashboard.
+
+Each installation (see installations.py) is built from its own partition; the
+cross-installation rollup in public/data/installations.json is then merged
+from the per-partition aggregates, without re-reading any conversations.
+
+    python3 scripts/build_accumulated.py [installation ...]    # default: all installations
+"""
 
 import json
+import os
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 
+from facet_index import build_facet_index, encode_facet_index
+from installations import DEFAULT_INSTALLATION, Partition, discover_partitions
+from quantile_sketch import QuantileSketch
+from question_clusters import QuestionClusterIndex
 
-def build_accumulated():
-    project_root = Path(__file__).parent.parent
-    processed_dir = project_root / 'logs' / 'processed'
-    out_path = project_root / 'public' / 'data' / 'accumulated.json'
 
-    if not processed_dir.exists():
-        print("No processed logs found. Run process_log.py first.")
-        sys.exit(1)
+def load_processed_days(processed_dir):
+    """Load every processed day JSON as a list of (filename, data) pairs."""
+    days = []
+    for f in sorted(processed_dir.glob('*.json')):
+        with open(f, 'r', encoding='utf-8') as fh:
+            days.append((f.name, json.load(fh)))
+    return days
 
-    # Load all processed files
-    all_files = sorted(processed_dir.glob('*.json'))
-    if not all_files:
-        print("No processed JSON files found.")
-        sys.exit(1)
 
+def load_rollups(rollup_dir):
+    """Load compacted day rollups (see compact_history.py) as (filename, data) pairs."""
+    if not rollup_dir.exists():
+        return []
+    return load_processed_days(rollup_dir)
+
+
+def _metric_values(interactions):
+    """Latency values per KPI metric, filtered the way the KPIs always have been."""
+    return {
+        'latency_ms': [i['latency_ms'] for i in interactions if i.get('latency_ms') and i['latency_ms'] > 0],
+        'opening_latency_ms': [i['opening_latency_ms'] for i in interactions if i.get('opening_latency_ms') and i['opening_latency_ms'] > 0],
+        'ai_think_ms': [i['ai_think_ms'] for i in interactions if i.get('ai_think_ms') and i['ai_think_ms'] > 0],
+        'net_gap_ms': [i['net_gap_ms'] for i in interactions if i.get('net_gap_ms') is not None],
+    }
+
+
+def compute_aggregate(interactions):
+    """Mergeable KPI aggregate (counts, sums, quantile sketches) for interactions.
+
+    Compacted days and partitions keep only this, so every KPI must be
+    derivable from it via ``kpi_from_aggregate``.
+    """
+    lang_counts = {}
+    topic_counts = {}
+    anomaly_types = {}
+    for i in interactions:
+        lang = i.get('language', 'unknown')
+        lang_counts[lang] = lang_counts.get(lang, 0) + 1
+        topic = i.get('topic', 'General')
+        topic_counts[topic] = topic_counts.get(topic, 0) + 1
+        for anom in i.get('anomalies', []) if i.get('is_anomaly') else []:
+            anomaly_types[anom] = anomaly_types.get(anom, 0) + 1
+
+    metrics = {}
+    sketches = {}
+    for metric, values in _metric_values(interactions).items():
+        metrics[metric] = {'n': len(values), 'sum': sum(values), 'max': max(values) if values else 0}
+        sketch = QuantileSketch()
+        for v in values:
+            sketch.add(v)
+        sketches[metric] = sketch.to_dict()
+
+    return {
+        'total': len(interactions),
+        'metrics': metrics,
+        # Seamless = AI finishes before actual opening audio ends (per-interaction check)
+        'seamless_count': sum(
+            1 for i in interactions
+            if i.get('ai_think_ms') is not None and i.get('opening_audio_duration_ms')
+            and i['ai_think_ms'] < i['opening_audio_duration_ms']
+        ),
+        'anomaly_count': sum(1 for i in interactions if i.get('is_anomaly')),
+        'failure_count': sum(1 for i in interactions if i.get('is_comprehension_failure')),
+        'out_of_order_count': sum(1 for i in interactions if i.get('is_out_of_order')),
+        'language_distribution': lang_counts,
+        'topic_distribution': topic_counts,
+        'anomaly_types': anomaly_types,
+        'sketches': sketches,
+    }
+
+
+def merge_aggregates(aggregates):
+    """Combine aggregates from several days / tiers / partitions into one."""
+    merged = compute_aggregate([])
+    sketches = {m: QuantileSketch.from_dict(d) for m, d in merged['sketches'].items()}
+    for agg in aggregates:
+        if not agg:
+            continue
+        for key in ('total', 'seamless_count', 'anomaly_count', 'failure_count', 'out_of_order_count'):
+            merged[key] += agg.get(key, 0)
+        for key in ('language_distribution', 'topic_distribution', 'anomaly_types'):
+            for k, v in agg.get(key, {}).items():
+                merged[key][k] = merged[key].get(k, 0) + v
+        for metric, m in agg.get('metrics', {}).items():
+            if not m['n']:
+                continue
+            target = merged['metrics'].setdefault(metric, {'n': 0, 'sum': 0, 'max': 0})
+            target['max'] = max(target['max'], m['max']) if target['n'] else m['max']
+            target['n'] += m['n']
+            target['sum'] += m['sum']
+        for metric, d in agg.get('sketches', {}).items():
+            sketches.setdefault(metric, QuantileSketch()).merge(QuantileSketch.from_dict(d))
+    merged['sketches'] = {m: s.to_dict() for m, s in sketches.items()}
+    return merged
+
+
+def kpi_from_aggregate(aggregate, total_days):
+    """Dashboard KPI block from a (possibly merged) aggregate."""
+    total = aggregate['total']
+    metrics = aggregate['metrics']
+
+    def avg(metric):
+        m = metrics.get(metric, {})
+        return int(m['sum'] / m['n']) if m.get('n') else 0
+
+    think_n = metrics.get('ai_think_ms', {}).get('n', 0)
+    percentiles = {}
+    for metric, d in aggregate.get('sketches', {}).items():
+        sketch = QuantileSketch.from_dict(d)
+        percentiles[metric] = {
+            f"p{int(q * 100)}": (round(sketch.quantile(q)) if sketch.count else 0)
+            for q in (0.5, 0.95, 0.99)
+        }
+
+    return {
+        'total_interactions': total,
+        'total_days': total_days,
+        'avg_interactions_per_day': round(total / total_days, 1) if total_days else 0,
+        'avg_latency_ms': avg('latency_ms'),
+        'max_latency_ms': metrics.get('latency_ms', {}).get('max', 0),
+        'avg_opening_latency_ms': avg('opening_latency_ms'),
+        'avg_ai_think_ms': avg('ai_think_ms'),
+        'seamless_response_rate': round(aggregate['seamless_count'] / think_n * 100, 1) if think_n else 0,
+        'avg_net_gap_ms': avg('net_gap_ms'),
+        'out_of_order_count': aggregate['out_of_order_count'],
+        'anomaly_count': aggregate['anomaly_count'],
+        'anomaly_rate': round(aggregate['anomaly_count'] / total * 100, 1) if total else 0,
+        'failure_count': aggregate['failure_count'],
+        'failure_rate': round(aggregate['failure_count'] / total * 100, 1) if total else 0,
+        'language_distribution': aggregate['language_distribution'],
+        'topic_distribution': aggregate['topic_distribution'],
+        # From mergeable sketches (±1%), so compacted days still count
+        'latency_percentiles': percentiles,
+    }
+
+
+def assemble_accumulated(days, facet_cache=None, rollups=(), installation=DEFAULT_INSTALLATION,
+                         cluster_sizes=None):
+    """Merge processed days of one installation into the accumulated dashboard structure.
+
+    Returns ``(accumulated, aggregate)``; the aggregate is the mergeable KPI
+    aggregate of the whole partition, used for the cross-installation rollup.
+
+    ``days`` is a list of (filename, data) pairs as returned by
+    ``load_processed_days``. Interaction dicts are copied, so the same
+    in-memory days can be assembled repeatedly (see rambam_pipeline.py).
+    ``facet_cache`` is passed through to ``build_facet_index``.
+    ``cluster_sizes`` is ``QuestionClusterIndex.sizes()`` of the installation.
+    ``rollups`` are compacted days (see compact_history.py): they contribute
+    daily stats, topic trend and KPIs, but no conversations.
+    """
     all_interactions = []
     daily_stats = []
     topic_trend = []
     anomaly_log = []
     dates = []
 
-    for f in all_files:
-        with open(f, 'r', encoding='utf-8') as fh:
-            data = json.load(fh)
+    for filename, data in rollups:
+        summary = data.get('summary', {})
+        if summary:
+            daily_stats.append(summary)
+        if data.get('date'):
+            dates.append(data['date'])
+            topic_entry = {'date': data['date']}
+            topic_entry.update(summary.get('topic_distribution', {}))
+            topic_trend.append(topic_entry)
 
+    for filename, data in days:
         date_str = data.get('date', '')
         interactions = data.get('interactions', [])
         summary = data.get('summary', {})
@@ -41,7 +198,9 @@ def build_accumulated():
 
         # Add interactions with sequential IDs
         for inter in interactions:
-            inter['_source_file'] = f.name
+            inter = dict(inter)
+            inter['_source_file'] = filename
+            inter.setdefault('installation', installation)
             all_interactions.append(inter)
 
         # Daily stats
@@ -72,6 +231,7 @@ def build_accumulated():
     # Sort everything
     all_interactions.sort(key=lambda x: x.get('time', ''))
     daily_stats.sort(key=lambda x: x.get('date', ''))
+    topic_trend.sort(key=lambda x: x['date'])
     dates.sort()
 
     # Deduplicate IDs — overlapping logs can produce identical msg IDs
@@ -84,58 +244,18 @@ def build_accumulated():
         else:
             seen_ids[cid] = 0
 
-    # Compute aggregate KPIs
-    total = len(all_interactions)
-    latencies = [i['latency_ms'] for i in all_interactions if i['latency_ms'] > 0]
-    total_days = len(daily_stats)
-
-    # Language counts
-    lang_counts = {}
-    for i in all_interactions:
-        lang = i.get('language', 'unknown')
-        lang_counts[lang] = lang_counts.get(lang, 0) + 1
-
-    # Topic counts
-    topic_counts = {}
-    for i in all_interactions:
-        topic = i.get('topic', 'General')
-        topic_counts[topic] = topic_counts.get(topic, 0) + 1
+    # Near-duplicate question clusters: size = how often it was ever asked, from the
+    # cluster index, so days compacted into rollups still count
+    cluster_sizes = cluster_sizes or {}
+    for inter in all_interactions:
+        if 'cluster_id' in inter:
+            inter['cluster_size'] = cluster_sizes.get(inter['cluster_id'], 0) if inter['cluster_id'] else 0
 
-    # Accuracy / quality
-    anomaly_total = sum(1 for i in all_interactions if i.get('is_anomaly'))
-    failure_total = sum(1 for i in all_interactions if i.get('is_comprehension_failure'))
-    out_of_order_total = sum(1 for i in all_interactions if i.get('is_out_of_order'))
-
-    # Two-Latency Model aggregations (using actual audio durations per interaction)
-    opening_lats = [i['opening_latency_ms'] for i in all_interactions if i.get('opening_latency_ms') and i['opening_latency_ms'] > 0]
-    think_times = [i['ai_think_ms'] for i in all_interactions if i.get('ai_think_ms') and i['ai_think_ms'] > 0]
-    # Seamless = AI finishes before actual opening audio ends (per-interaction check)
-    seamless_count = sum(
-        1 for i in all_interactions
-        if i.get('ai_think_ms') is not None and i.get('opening_audio_duration_ms')
-        and i['ai_think_ms'] < i['opening_audio_duration_ms']
-    )
-    net_gaps = [i['net_gap_ms'] for i in all_interactions if i.get('net_gap_ms') is not None]
-    avg_net_gap = int(sum(net_gaps) / len(net_gaps)) if net_gaps else 0
-
-    kpi = {
-        'total_interactions': total,
-        'total_days': total_days,
-        'avg_interactions_per_day': round(total / total_days, 1) if total_days else 0,
-        'avg_latency_ms': int(sum(latencies) / len(latencies)) if latencies else 0,
-        'max_latency_ms': max(latencies) if latencies else 0,
-        'avg_opening_latency_ms': int(sum(opening_lats) / len(opening_lats)) if opening_lats else 0,
-        'avg_ai_think_ms': int(sum(think_times) / len(think_times)) if think_times else 0,
-        'seamless_response_rate': round(seamless_count / len(think_times) * 100, 1) if think_times else 0,
-        'avg_net_gap_ms': avg_net_gap,
-        'out_of_order_count': out_of_order_total,
-        'anomaly_count': anomaly_total,
-        'anomaly_rate': round(anomaly_total / total * 100, 1) if total else 0,
-        'failure_count': failure_total,
-        'failure_rate': round(failure_total / total * 100, 1) if total else 0,
-        'language_distribution': lang_counts,
-        'topic_distribution': topic_counts,
-    }
+    # Compute aggregate KPIs — live conversations plus rolled-up (compacted) days
+    total_days = len(daily_stats)
+    aggregate = merge_aggregates([compute_aggregate(all_interactions)] + [r.get('aggregate', {}) for _, r in rollups])
+    kpi = kpi_from_aggregate(aggregate, total_days)
+    total = aggregate['total']
 
     # Build final structure
     accumulated = {
@@ -145,25 +265,128 @@ def build_accumulated():
             'total_conversations': total,
             'date_range': [dates[0], dates[-1]] if dates else [],
             'generated_by': 'build_accumulated.py v2',
+            'installation': installation,
+            'tiers': {
+                'full': sum(1 for _, d in days if d.get('tier', 'full') == 'full'),
+                'archived': sum(1 for _, d in days if d.get('tier') == 'archived'),
+                'rollup': len(rollups),
+            },
         },
         'kpi': kpi,
         'daily_stats': daily_stats,
         'topic_trend': topic_trend,
         'anomaly_log': anomaly_log,
         'conversations': all_interactions,
+        # Bitmap per facet value over conversation ordinals (see facet_index.py)
+        'facet_index': encode_facet_index(build_facet_index(all_interactions, facet_cache), total),
     }
+    return accumulated, aggregate
+
+
+def write_json_atomic(path, data, indent=None, sort_keys=False, end=''):
+    """Write JSON via a temp file + rename, so readers (query_server.py) never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per thread too: the pipeline daemon writes from parallel request threads
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent, sort_keys=sort_keys)
+        f.write(end)
+    os.replace(tmp, path)
 
-    # Write output
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(accumulated, f, ensure_ascii=False, indent=2)
 
-    print(f"Built accumulated.json: {total} interactions across {total_days} days")
-    print(f"  Date range: {dates[0] if dates else '?'} → {dates[-1] if dates else '?'}")
-    print(f"  Anomalies: {anomaly_total} ({kpi['anomaly_rate']}%)")
+def write_accumulated(accumulated, out_path):
+    """Write the accumulated structure and print a short report."""
+    write_json_atomic(out_path, accumulated, indent=2)
+
+    meta = accumulated['meta']
+    kpi = accumulated['kpi']
+    date_range = meta['date_range']
+    print(f"Built accumulated.json: {meta['total_conversations']} interactions across {meta['total_days']} days")
+    print(f"  Date range: {date_range[0] if date_range else '?'} → {date_range[-1] if date_range else '?'}")
+    print(f"  Anomalies: {kpi['anomaly_count']} ({kpi['anomaly_rate']}%)")
     print(f"  Avg latency: {kpi['avg_latency_ms']}ms")
     print(f"  Output: {out_path}")
 
 
+def write_partition_aggregate(accumulated, aggregate, out_path):
+    """Write the partition's KPI aggregate next to its accumulated.json."""
+    meta = accumulated['meta']
+    write_json_atomic(out_path, {
+        'installation': meta['installation'],
+        'last_updated': meta['last_updated'],
+        'total_days': meta['total_days'],
+        'date_range': meta['date_range'],
+        'aggregate': aggregate,
+    })
+
+
+def build_partition(partition):
+    """Build accumulated.json and aggregate.json of one installation; False if it has no data."""
+    days = load_processed_days(partition.processed_dir) if partition.processed_dir.exists() else []
+    rollups = load_rollups(partition.rollup_dir)
+    if not days and not rollups:
+        print(f"No processed JSON files found for installation {partition.installation}.")
+        return False
+
+    cluster_sizes = QuestionClusterIndex.load(partition.clusters_path).sizes()
+    accumulated, aggregate = assemble_accumulated(days, rollups=rollups, installation=partition.installation,
+                                                  cluster_sizes=cluster_sizes)
+    write_accumulated(accumulated, partition.accumulated_path)
+    write_partition_aggregate(accumulated, aggregate, partition.aggregate_path)
+    return True
+
+
+def build_installations_rollup(project_root=Path(__file__).parent.parent):
+    """Cross-installation KPIs, merged from every partition's aggregate.json."""
+    data_dir = project_root / 'public' / 'data'
+    installations = {}
+    aggregates = []
+    total_days = 0
+    dates = []
+    for path in sorted((data_dir / 'installations').glob('*/aggregate.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            part = json.load(f)
+        installations[part['installation']] = {
+            'total_days': part['total_days'],
+            'date_range': part['date_range'],
+            'last_updated': part['last_updated'],
+            'kpi': kpi_from_aggregate(part['aggregate'], part['total_days']),
+        }
+        aggregates.append(part['aggregate'])
+        total_days += part['total_days']
+        dates.extend(part['date_range'])
+
+    merged = merge_aggregates(aggregates)
+    rollup = {
+        'meta': {
+            'last_updated': datetime.now().isoformat() + 'Z',
+            'installations': sorted(installations),
+            'total_days': total_days,  # summed over installations
+            'total_conversations': merged['total'],
+            'date_range': [min(dates), max(dates)] if dates else [],
+        },
+        'kpi': kpi_from_aggregate(merged, total_days),
+        'installations': installations,
+    }
+    write_json_atomic(data_dir / 'installations.json', rollup, indent=2)
+    print(f"Built installations.json: {merged['total']} interactions across {len(installations)} installation(s)")
+    return rollup
+
+
+def build_accumulated(installations=None):
+    project_root = Path(__file__).parent.parent
+    if installations:
+        partitions = [Partition(name, project_root) for name in installations]
+    else:
+        partitions = discover_partitions(project_root)
+
+    # Build each requested partition; the others keep their last aggregate.json
+    built = [p for p in partitions if build_partition(p)]
+    if not built:
+        print("No processed logs found. Run process_log.py first.")
+        sys.exit(1)
+    build_installations_rollup(project_root)
+
+
 if __name__ == '__main__':
-    build_accumulated()
+    build_accumulated(sys.argv[1:])
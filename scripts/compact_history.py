@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Tiered retention and compaction for processed history.
+
+Each processed day falls into a tier by its age relative to the newest day:
+
+    full      (< recent_days)   logs/processed/<stem>.json as produced
+    archived  (< archive_days)  logs/processed/<stem>.json without `answer` /
+                                `answer_en`; the text moves to
+                                logs/archive/answers/<stem>.json.gz
+    rollup    (older)           logs/rollups/<stem>.json — daily summary plus
+                                the mergeable KPI aggregate (counts, sums,
+                                quantile sketches); the processed file is removed
+
+build_accumulated.py computes every KPI from all three tiers, and its cost is
+bounded by the full + archived window. Each installation partition (see
+installations.py) is compacted on its own, with the same directory layout
+under its partition. Tiers come from logs/retention.json
+(``{"recent_days": 30, "archive_days": 180}``) or the command line.
+process_all_new.py only compacts once logs/retention.json exists (or with
+``--compact``); the static dashboard cannot fetch archived answers.
+
+    python3 scripts/compact_history.py [--installation default] [--recent-days 30] [--archive-days 180] [--dry-run]
+    python3 scripts/compact_history.py answer <stem> <interaction_id> [installation]
+"""
+
+import argparse
+import gzip
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from build_accumulated import compute_aggregate  # noqa: E402
+from installations import DEFAULT_INSTALLATION, Partition, discover_partitions  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+ARCHIVE_DIR = Partition().archive_dir
+RETENTION_PATH = PROJECT_ROOT / 'logs' / 'retention.json'
+
+DEFAULT_TIERS = {'recent_days': 30, 'archive_days': 180}
+ARCHIVED_FIELDS = ('answer', 'answer_en')
+
+
+def retention_enabled():
+    """Automatic compaction is opt-in: only once logs/retention.json exists."""
+    return RETENTION_PATH.exists()
+
+
+def load_tiers():
+    tiers = dict(DEFAULT_TIERS)
+    try:
+        with open(RETENTION_PATH) as f:
+            tiers.update(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return tiers
+
+
+def _parse_date(date_str):
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+
+def _stem_date_str(stem):
+    # Log files are named YYYYMMDD[-N]; processed days carry the same date
+    return f"{stem[:4]}-{stem[4:6]}-{stem[6:8]}"
+
+
+def _stem_date(stem):
+    return _parse_date(_stem_date_str(stem))
+
+
+def tier_for(date_str, newest, tiers):
+    date = _parse_date(date_str)
+    if date is None or newest is None:
+        return 'full'
+    age = (newest - date).days
+    if age < tiers['recent_days']:
+        return 'full'
+    if age < tiers['archive_days']:
+        return 'archived'
+    return 'rollup'
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def archive_answers(data, stem, archive_dir=ARCHIVE_DIR):
+    """Move answer text of a processed day into a gzip archive (in place on ``data``)."""
+    archive_path = archive_dir / f"{stem}.json.gz"
+    archived = {}
+    if archive_path.exists():
+        with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+            archived = json.load(f)
+    for inter in data.get('interactions', []):
+        if inter.get('answer_archived'):
+            continue
+        archived[inter['id']] = {field: inter.get(field, '') for field in ARCHIVED_FIELDS}
+        for field in ARCHIVED_FIELDS:
+            inter[field] = ''
+        inter['answer_archived'] = True
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    with gzip.open(archive_path, 'wt', encoding='utf-8') as f:
+        json.dump(archived, f, ensure_ascii=False)
+    data['tier'] = 'archived'
+    return data
+
+
+def rollup_day(data):
+    """Reduce a processed day to its summary and mergeable KPI aggregate."""
+    return {
+        'date': data.get('date', ''),
+        'filename': data.get('filename', ''),
+        'tier': 'rollup',
+        'summary': data.get('summary', {}),
+        'aggregate': compute_aggregate(data.get('interactions', [])),
+    }
+
+
+def fetch_archived_answer(stem, interaction_id, archive_dir=ARCHIVE_DIR):
+    """Return {'answer', 'answer_en'} for an archived interaction, or None.
+
+    ``interaction_id`` may carry the `_N` suffix build_accumulated adds to
+    duplicate ids; the original id is tried as well.
+    """
+    archive_path = archive_dir / f"{Path(stem).stem.replace('.json', '')}.json.gz"
+    if not archive_path.exists():
+        return None
+    with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+        archived = json.load(f)
+    if interaction_id in archived:
+        return archived[interaction_id]
+    base, _, suffix = interaction_id.rpartition('_')
+    if base and suffix.isdigit():
+        return archived.get(base)
+    return None
+
+
+def _prune_state(stems, partition):
+    """Rolled-up days are never reprocessed, so drop their per-interaction state."""
+    from anomaly_detector import AdaptiveDetector
+    from question_clusters import QuestionClusterIndex
+    detector = AdaptiveDetector.load(partition.detector_path)
+    clusters = QuestionClusterIndex.load(partition.clusters_path)
+    for stem in stems:
+        detector.learned.pop(stem, None)
+        clusters.assigned.pop(stem, None)
+    detector.save(partition.detector_path)
+    clusters.save(partition.clusters_path)
+
+
+def compact(tiers=None, dry_run=False, partition=None):
+    """Move one installation's processed days into their tier.
+
+    Returns {'archived': [stems], 'rollup': [stems]}.
+    """
+    tiers = tiers or load_tiers()
+    if tiers['archive_days'] < tiers['recent_days']:
+        raise ValueError("archive_days must be >= recent_days")
+    partition = partition or Partition()
+
+    files = sorted(partition.processed_dir.glob('*.json'))
+    dates = [_stem_date(f.stem) for f in files + sorted(partition.rollup_dir.glob('*.json'))]
+    dates = [d for d in dates if d]
+    newest = max(dates) if dates else None
+
+    moved = {'archived': [], 'rollup': []}
+    for path in files:
+        # Tiers come from the stem date, so only days that change tier are read
+        target = tier_for(_stem_date_str(path.stem), newest, tiers)
+        if target == 'full':
+            continue  # never re-inflate archived days
+        if target == 'archived' and (partition.archive_dir / f"{path.stem}.json.gz").exists():
+            continue  # already archived
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        current = data.get('tier', 'full')
+        if target == current:
+            continue
+        moved[target].append(path.stem)
+        if dry_run:
+            continue
+        # Answer text is archived before a day is rolled up, so it stays fetchable
+        if current == 'full':
+            archive_answers(data, path.stem, partition.archive_dir)
+        if target == 'archived':
+            _write_json(path, data)
+        else:
+            _write_json(partition.rollup_dir / path.name, rollup_day(data))
+            path.unlink()
+
+    if moved['rollup'] and not dry_run:
+        _prune_state(moved['rollup'], partition)
+    return moved
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'answer':
+        if len(sys.argv) not in (4, 5):
+            print("Usage: python3 compact_history.py answer <stem> <interaction_id> [installation]")
+            sys.exit(1)
+        partition = Partition(sys.argv[4] if len(sys.argv) == 5 else DEFAULT_INSTALLATION)
+        answer = fetch_archived_answer(sys.argv[2], sys.argv[3], partition.archive_dir)
+        if answer is None:
+            print("Not found in archive.")
+            sys.exit(1)
+        print(json.dumps(answer, ensure_ascii=False, indent=2))
+        return
+
+    parser = argparse.ArgumentParser(description='Tiered retention and compaction')
+    tiers = load_tiers()
+    parser.add_argument('--recent-days', type=int, default=tiers['recent_days'])
+    parser.add_argument('--archive-days', type=int, default=tiers['archive_days'])
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--installation', action='append',
+                        help='installation to compact (repeatable; default: all)')
+    args = parser.parse_args()
+
+    tiers = {'recent_days': args.recent_days, 'archive_days': args.archive_days}
+    if args.installation:
+        partitions = [Partition(name) for name in args.installation]
+    else:
+        partitions = discover_partitions()
+    prefix = 'Would move' if args.dry_run else 'Moved'
+    for partition in partitions:
+        moved = compact(tiers, args.dry_run, partition)
+        for tier in ('archived', 'rollup'):
+            if moved[tier]:
+                print(f"[{partition.installation}] {prefix} {len(moved[tier])} day(s) to {tier}: "
+                      f"{', '.join(moved[tier])}")
+        if not any(moved.values()):
+            print(f"[{partition.installation}] Nothing to compact.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Facet bitmap index over the accumulated conversation array.
+
+One bitmap per facet value over the conversation ordinal (its position in
+accumulated.json `conversations`), plus a count per value. Any filter
+combination is an OR within a facet and an AND across facets, so counts and
+matches need no re-scan of the conversations.
+
+Bitmaps are Python ints in memory and run-length encoded on disk as a flat
+[start, length, start, length, ...] list. Indexes are built per day block and
+merged by shifting each block to its offset. Bitmaps are converted to and
+from ordinals and runs through their binary digit string, in time linear in
+the bitmap size.
+
+    python3 scripts/facet_index.py verify   # check bitmap queries against brute force
+"""
+
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def speed_band(latency_ms):
+    """Same bands as the dashboard's speed filter (FacetedFilters.tsx)."""
+    if not latency_ms or latency_ms <= 0:
+        return 'none'
+    if latency_ms <= 2000:
+        return 'fast'
+    if latency_ms <= 3000:
+        return 'warning'
+    return 'slow'
+
+
+# facet name -> values of one conversation (multi-valued facets return several)
+FACETS = {
+    'topic': lambda c: [c.get('topic') or 'General'],
+    'language': lambda c: [c.get('language') or 'unknown'],
+    'sensitivity': lambda c: [c.get('sensitivity') or 'low'],
+    'speed': lambda c: [speed_band(c.get('latency_ms'))],
+    'anomaly': lambda c: c.get('anomalies') or [],
+    'is_anomaly': lambda c: ['true' if c.get('is_anomaly') else 'false'],
+    'stop': lambda c: ['true' if c.get('is_thank_you_interrupt') else 'false'],
+}
+
+
+def bitmap_from_ordinals(ordinals, size=None):
+    """Bitmap with the given ordinals set."""
+    if not ordinals:
+        return 0
+    digits = bytearray(b'0') * (size or max(ordinals) + 1)
+    for ordinal in ordinals:
+        digits[ordinal] = 0x31  # '1'
+    return int(digits[::-1], 2)
+
+
+def _digits(bits):
+    """Binary digits of a bitmap, ordinal 0 first."""
+    return bin(bits)[:1:-1]
+
+
+def build_block_index(conversations):
+    """Build {facet: {value: bitmap}} with ordinals local to this block."""
+    members = {facet: {} for facet in FACETS}
+    for ordinal, conv in enumerate(conversations):
+        for facet, values_of in FACETS.items():
+            values = members[facet]
+            for value in values_of(conv):
+                values.setdefault(value, []).append(ordinal)
+    size = len(conversations)
+    return {facet: {value: bitmap_from_ordinals(ords, size) for value, ords in values.items()}
+            for facet, values in members.items()}
+
+
+def merge_block_indexes(blocks):
+    """Merge [(offset, block_index), ...] into one index over global ordinals."""
+    merged = {facet: {} for facet in FACETS}
+    for offset, block in blocks:
+        for facet, values in block.items():
+            target = merged.setdefault(facet, {})
+            for value, bits in values.items():
+                target[value] = target.get(value, 0) | (bits << offset)
+    return merged
+
+
+def build_facet_index(conversations, cache=None):
+    """Build the index over conversations, one block per contiguous date run.
+
+    ``cache`` (optional dict) keeps block indexes between calls — the
+    pipeline daemon passes one so only the changed day is rebuilt.
+    """
+    blocks = []
+    start = 0
+    n = len(conversations)
+    while start < n:
+        date = conversations[start].get('date', '')
+        end = start
+        while end < n and conversations[end].get('date', '') == date:
+            end += 1
+        block = conversations[start:end]
+        if cache is None:
+            block_index = build_block_index(block)
+        else:
+            key = tuple((c.get('_source_file', ''), c.get('id', '')) for c in block)
+            if key not in cache:
+                cache[key] = build_block_index(block)
+            block_index = cache[key]
+        blocks.append((start, block_index))
+        start = end
+    return merge_block_indexes(blocks)
+
+
+def evict_source(cache, filename):
+    """Drop cached blocks containing conversations from a re-ingested file."""
+    for key in [k for k in cache if any(source == filename for source, _ in k)]:
+        del cache[key]
+
+
+def bitmap_to_runs(bits):
+    """Encode an int bitmap as a flat [start, length, ...] run list."""
+    runs = []
+    for m in re.finditer('1+', _digits(bits)):
+        runs.extend((m.start(), m.end() - m.start()))
+    return runs
+
+
+def runs_to_bitmap(runs):
+    if not runs:
+        return 0
+    digits = bytearray(b'0') * (runs[-2] + runs[-1])
+    for i in range(0, len(runs), 2):
+        start, length = runs[i], runs[i + 1]
+        digits[start:start + length] = b'1' * length
+    return int(digits[::-1], 2)
+
+
+def encode_facet_index(index, size):
+    """Serializable form published in accumulated.json."""
+    return {
+        'size': size,
+        'encoding': 'runs',
+        'facets': {
+            facet: {
+                value: {'count': bin(bits).count('1'), 'runs': bitmap_to_runs(bits)}
+                for value, bits in sorted(values.items())
+            }
+            for facet, values in index.items()
+        },
+    }
+
+
+def decode_facet_index(encoded):
+    """Inverse of encode_facet_index: {facet: {value: bitmap}}."""
+    return {
+        facet: {value: runs_to_bitmap(entry['runs']) for value, entry in values.items()}
+        for facet, values in encoded['facets'].items()
+    }
+
+
+def query(index, size, filters):
+    """AND across facets of (OR within facet) for filters {facet: [values]}."""
+    result = (1 << size) - 1
+    for facet, values in filters.items():
+        if not values:
+            continue
+        facet_bits = 0
+        for value in values:
+            facet_bits |= index.get(facet, {}).get(value, 0)
+        result &= facet_bits
+    return result
+
+
+def ordinals(bits):
+    """Ascending conversation ordinals set in a bitmap."""
+    return [m.start() for m in re.finditer('1', _digits(bits))]
+
+
+def brute_force(conversations, filters):
+    return [
+        i for i, conv in enumerate(conversations)
+        if all(not values or set(values) & set(FACETS[facet](conv)) for facet, values in filters.items())
+    ]
+
+
+def verify(accumulated, trials=500, seed=0):
+    """Compare random bitmap queries with brute-force filtering. Returns mismatches."""
+    conversations = accumulated['conversations']
+    encoded = accumulated.get('facet_index') or encode_facet_index(build_facet_index(conversations), len(conversations))
+    index = decode_facet_index(encoded)
+    size = encoded['size']
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(trials):
+        filters = {}
+        facets = [facet for facet, values in index.items() if values]
+        for facet in rng.sample(facets, rng.randint(1, min(3, len(facets)))):
+            values = list(index[facet])
+            filters[facet] = rng.sample(values, rng.randint(1, min(2, len(values))))
+        bits = query(index, size, filters)
+        if ordinals(bits) != brute_force(conversations, filters):
+            mismatches += 1
+            print(f"  mismatch for {filters}")
+    for facet, values in encoded['facets'].items():
+        for value, entry in values.items():
+            if entry['count'] != len(brute_force(conversations, {facet: [value]})):
+                mismatches += 1
+                print(f"  count mismatch for {facet}={value}")
+    return mismatches
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'verify':
+        print("Usage: python3 facet_index.py verify [accumulated.json]")
+        sys.exit(1)
+    path = Path(sys.argv[2]) if len(sys.argv) > 2 else PROJECT_ROOT / 'public' / 'data' / 'accumulated.json'
+    with open(path, 'r', encoding='utf-8') as f:
+        accumulated = json.load(f)
+    mismatches = verify(accumulated)
+    if mismatches:
+        print(f"Facet index verification FAILED: {mismatches} mismatch(es)")
+        sys.exit(1)
+    print(f"Facet index OK: bitmap queries match brute-force filtering over {len(accumulated['conversations'])} conversations")
+
+
+if __name__ == '__main__':
+    main()
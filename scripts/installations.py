@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Installation (exhibit site) partitions of the pipeline.
+
+Raw logs of each site live in their own directory, logs/raw/<installation>/YYYYMMDD.txt.
+Flat files directly in logs/raw/ belong to the default installation, whose
+outputs keep their original locations. Every other installation is processed
+independently into its own partition:
+
+    logs/processed/<id>/  logs/rollups/<id>/  logs/archive/answers/<id>/
+    logs/state/<id>/      logs/timeseries/<id>/
+    public/data/installations/<id>/accumulated.json
+
+Each partition build also writes public/data/installations/<id>/aggregate.json
+(the mergeable KPI aggregate), from which build_accumulated.py produces the
+cross-installation rollup public/data/installations.json.
+
+    python3 scripts/installations.py      # list installations and their raw / processed counts
+"""
+
+import re
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_INSTALLATION = 'default'
+INSTALLATION_RE = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
+
+
+def validate_installation(installation):
+    if not INSTALLATION_RE.match(installation or ''):
+        raise ValueError(f"bad installation id {installation!r}: use lowercase letters, digits, '-' and '_'")
+    return installation
+
+
+class Partition:
+    """Input and output locations of one installation."""
+
+    def __init__(self, installation=DEFAULT_INSTALLATION, project_root=PROJECT_ROOT):
+        self.installation = validate_installation(installation)
+        self.project_root = Path(project_root)
+        logs = self.project_root / 'logs'
+        data = self.project_root / 'public' / 'data'
+        self.aggregate_path = data / 'installations' / installation / 'aggregate.json'
+        if installation == DEFAULT_INSTALLATION:
+            sub = ()
+            self.accumulated_path = data / 'accumulated.json'
+        else:
+            sub = (installation,)
+            self.accumulated_path = data / 'installations' / installation / 'accumulated.json'
+        self.raw_dir = logs.joinpath('raw', *sub)
+        self.processed_dir = logs.joinpath('processed', *sub)
+        self.rollup_dir = logs.joinpath('rollups', *sub)
+        self.archive_dir = logs.joinpath('archive', 'answers', *sub)
+        self.state_dir = logs.joinpath('state', *sub)
+        self.timeseries_dir = logs.joinpath('timeseries', *sub)
+
+    @property
+    def detector_path(self):
+        return self.state_dir / 'anomaly_detector.json'
+
+    @property
+    def clusters_path(self):
+        return self.state_dir / 'question_clusters.json'
+
+    def raw_files(self):
+        return sorted(self.raw_dir.glob('*.txt')) if self.raw_dir.exists() else []
+
+    def is_rolled_up(self, stem):
+        """True if the day was compacted into a rollup (see compact_history.py) and cannot be reprocessed."""
+        return (self.rollup_dir / f"{stem}.json").exists()
+
+    def done_stems(self):
+        """Stems already processed, including days compacted into rollups."""
+        stems = {f.stem for f in self.processed_dir.glob('*.json')}
+        return stems | {f.stem for f in self.rollup_dir.glob('*.json')}
+
+    def new_files(self):
+        done = self.done_stems()
+        return [f for f in self.raw_files() if f.stem not in done]
+
+    def __repr__(self):
+        return f"Partition({self.installation!r})"
+
+
+def partition_for(raw_path, project_root=PROJECT_ROOT):
+    """Partition of a raw log file: its directory under logs/raw/, or the default one."""
+    raw_root = (Path(project_root) / 'logs' / 'raw').resolve()
+    parent = Path(raw_path).resolve().parent
+    if parent.parent == raw_root:
+        return Partition(parent.name, project_root)
+    return Partition(DEFAULT_INSTALLATION, project_root)
+
+
+def discover_partitions(project_root=PROJECT_ROOT):
+    """Every installation with raw logs or processed output, default first."""
+    project_root = Path(project_root)
+    names = set()
+    for base in ('raw', 'processed', 'rollups'):
+        d = project_root / 'logs' / base
+        if d.exists():
+            names.update(p.name for p in d.iterdir() if p.is_dir() and INSTALLATION_RE.match(p.name))
+    names.discard(DEFAULT_INSTALLATION)
+    return [Partition(DEFAULT_INSTALLATION, project_root)] + [Partition(n, project_root) for n in sorted(names)]
+
+
+def main():
+    print(f"{'installation':<20} {'raw':>5} {'processed':>10} {'new':>5}")
+    for p in discover_partitions():
+        print(f"{p.installation:<20} {len(p.raw_files()):>5} {len(p.done_stems()):>10} {len(p.new_files()):>5}")
+
+
+if __name__ == '__main__':
+    main()
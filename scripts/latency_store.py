@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""Fixed-width binary latency time-series store for long-horizon analysis.
+
+One file per month in logs/timeseries/YYYY-MM.bin, records sorted by time:
+
+    epoch_ms            int64
+    latency_ms          int32   \\
+    opening_latency_ms  int32    |
+    ai_think_ms         int32    |  NULL_VALUE when not measured
+    stream_duration_ms  int32    |
+    net_gap_ms          int32   /
+    source              uint32  crc32 of the log file stem (for idempotent re-ingest)
+
+Files are read through numpy.memmap when numpy is installed (otherwise a
+pure-Python mmap view) and range seeks are a binary search on epoch_ms, so
+windowed queries never decode JSON.
+
+    python3 scripts/latency_store.py rebuild
+    python3 scripts/latency_store.py hourly --metric latency_ms --p 95 --from 2026-01-01 --to 2026-12-31 [--window 24]
+    python3 scripts/latency_store.py compare --at "2026-02-22 12:00" --days 7 [--metric ai_think_ms]
+
+Other installations keep their own store in logs/timeseries/<installation>/
+(``latency_store.py --installation <id> ...``).
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from installations import DEFAULT_INSTALLATION, Partition
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+PROJECT_ROOT = Path(__file__).parent.parent
+STORE_DIR = PROJECT_ROOT / 'logs' / 'timeseries'
+ISRAEL_TZ = ZoneInfo('Asia/Jerusalem')
+
+METRICS = ['latency_ms', 'opening_latency_ms', 'ai_think_ms', 'stream_duration_ms', 'net_gap_ms']
+NULL_VALUE = -2 ** 31
+RECORD = struct.Struct('<q5iI')
+RECORD_SIZE = RECORD.size  # 32 bytes
+HOUR_MS = 3600 * 1000
+
+if HAS_NUMPY:
+    RECORD_DTYPE = np.dtype([('epoch_ms', '<i8')] + [(m, '<i4') for m in METRICS] + [('source', '<u4')])
+
+
+def source_key(stem):
+    return zlib.crc32(stem.encode('utf-8'))
+
+
+def _to_int32(value, zero_is_null=False):
+    if value is None or (zero_is_null and value == 0):
+        return NULL_VALUE
+    return max(NULL_VALUE + 1, min(2 ** 31 - 1, int(value)))
+
+
+def interaction_record(inter, source):
+    """Pack an interaction into (record tuple, 'YYYY-MM'), or None if it has no timestamp."""
+    try:
+        dt = datetime.strptime(inter.get('time', ''), '%Y/%m/%d %H:%M:%S').replace(tzinfo=ISRAEL_TZ)
+    except (ValueError, TypeError):
+        return None
+    return (
+        int(dt.timestamp() * 1000),
+        _to_int32(inter.get('latency_ms'), zero_is_null=True),  # 0 = not measured
+        _to_int32(inter.get('opening_latency_ms')),
+        _to_int32(inter.get('ai_think_ms')),
+        _to_int32(inter.get('stream_duration_ms')),
+        _to_int32(inter.get('net_gap_ms')),
+        source,
+    ), dt.strftime('%Y-%m')
+
+
+class _EpochView:
+    """Sequence view over the epoch column of a mmapped month file (for bisect)."""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.n = len(buf) // RECORD_SIZE
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return struct.unpack_from('<q', self.buf, i * RECORD_SIZE)[0]
+
+
+def _read_records(path):
+    if not path.exists():
+        return []
+    return list(RECORD.iter_unpack(path.read_bytes()))
+
+
+def _index_path(path):
+    return path.with_suffix('.sources.json')
+
+
+def _write_atomic(path, data):
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_source_index(path, index):
+    """Sidecar {source: [count, first_epoch_ms]}, so appends can find a source's records without a scan."""
+    _write_atomic(_index_path(path), json.dumps({str(k): v for k, v in index.items()}).encode('utf-8'))
+
+
+def _load_source_index(path):
+    try:
+        with open(_index_path(path)) as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_month(path, records):
+    """Rewrite a whole month file (records sorted) and its source index."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _write_atomic(path, b''.join(RECORD.pack(*r) for r in records))
+    index = {}
+    for r in records:
+        entry = index.setdefault(r[-1], [0, r[0]])
+        entry[0] += 1
+        entry[1] = min(entry[1], r[0])
+    _write_source_index(path, index)
+
+
+def _append_only(path, source, new):
+    """Fast path for a growing day: append ``new`` records without rewriting the month.
+
+    Applies when the source's stored records are all still in ``new`` and
+    the remaining records sort after the last stored one. Only the tail
+    from the source's first record is read. Returns False when a full
+    rewrite is needed (re-ingested day, missing or stale index).
+    """
+    index = _load_source_index(path)
+    if index is None or not path.exists():
+        return False
+    size = path.stat().st_size
+    n = size // RECORD_SIZE
+    if size % RECORD_SIZE or n == 0 or sum(c for c, _ in index.values()) != n:
+        return False
+
+    count, first = index.get(source, (0, None))
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        last = RECORD.unpack_from(buf, (n - 1) * RECORD_SIZE)
+        old = []
+        if count:
+            lo = bisect.bisect_left(_EpochView(buf), first)
+            old = [r for r in RECORD.iter_unpack(buf[lo * RECORD_SIZE:]) if r[-1] == source]
+    if len(old) != count:
+        return False
+
+    remaining = {}
+    for r in new:
+        remaining[r] = remaining.get(r, 0) + 1
+    for r in old:
+        if not remaining.get(r):
+            return False  # a stored record changed or disappeared
+        remaining[r] -= 1
+    extra = sorted(r for r, c in remaining.items() for _ in range(c))
+    if not extra:
+        return True
+    if extra[0] < last:
+        return False
+
+    with open(path, 'ab') as f:
+        f.write(b''.join(RECORD.pack(*r) for r in extra))
+    entry = index.setdefault(source, [0, extra[0][0]])
+    entry[0] += len(extra)
+    entry[1] = min(entry[1], extra[0][0])
+    _write_source_index(path, index)
+    return True
+
+
+def append_interactions(interactions, stem, store_dir=STORE_DIR):
+    """Add a processed day's latencies to the store, replacing earlier records from the same file.
+
+    A day that only grew since its last ingest (the daemon's line
+    submissions) is appended in place; anything else rewrites the month.
+    """
+    source = source_key(stem)
+    by_month = {}
+    for inter in interactions:
+        packed = interaction_record(inter, source)
+        if packed:
+            record, month = packed
+            by_month.setdefault(month, []).append(record)
+
+    # Also revisit the file's own month, in case a re-ingest no longer has records there
+    months = set(by_month)
+    if len(stem) >= 6 and stem[:6].isdigit():
+        months.add(f"{stem[:4]}-{stem[4:6]}")
+
+    written = 0
+    for month in sorted(months):
+        path = store_dir / f"{month}.bin"
+        new = by_month.get(month, [])
+        if _append_only(path, source, new):
+            written += len(new)
+            continue
+        existing = _read_records(path)
+        kept = [r for r in existing if r[-1] != source]
+        if not new and len(kept) == len(existing):
+            continue
+        _write_month(path, sorted(kept + new))
+        written += len(new)
+    return written
+
+
+def _month_paths(start_ms, end_ms, store_dir):
+    start = datetime.fromtimestamp(start_ms / 1000, ISRAEL_TZ).strftime('%Y-%m')
+    end = datetime.fromtimestamp(end_ms / 1000, ISRAEL_TZ).strftime('%Y-%m')
+    return [p for p in sorted(store_dir.glob('*.bin')) if start <= p.stem <= end]
+
+
+def load_range(start_ms, end_ms, metric, store_dir=STORE_DIR):
+    """Return (epochs, values) for non-null ``metric`` with start_ms <= epoch < end_ms.
+
+    numpy arrays when numpy is available, otherwise lists. Each month file is
+    binary-searched, so only records inside the range are touched.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    epochs, values = [], []
+    for path in _month_paths(start_ms, end_ms, store_dir):
+        if path.stat().st_size < RECORD_SIZE:
+            continue
+        if HAS_NUMPY:
+            data = np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+            lo, hi = np.searchsorted(data['epoch_ms'], [start_ms, end_ms])
+            chunk = data[lo:hi]
+            mask = chunk[metric] != NULL_VALUE
+            epochs.append(np.asarray(chunk['epoch_ms'][mask]))
+            values.append(np.asarray(chunk[metric][mask]))
+        else:
+            col = METRICS.index(metric) + 1
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                view = _EpochView(buf)
+                lo, hi = bisect.bisect_left(view, start_ms), bisect.bisect_left(view, end_ms)
+                for r in RECORD.iter_unpack(buf[lo * RECORD_SIZE:hi * RECORD_SIZE]):
+                    if r[col] != NULL_VALUE:
+                        epochs.append(r[0])
+                        values.append(r[col])
+    if HAS_NUMPY:
+        if not epochs:
+            return np.empty(0, dtype='<i8'), np.empty(0, dtype='<i4')
+        return np.concatenate(epochs), np.concatenate(values)
+    return epochs, values
+
+
+def _percentile(values, p):
+    if HAS_NUMPY:
+        return float(np.percentile(values, p)) if len(values) else None
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _search(epochs, x):
+    return int(np.searchsorted(epochs, x)) if HAS_NUMPY else bisect.bisect_left(epochs, x)
+
+
+def hourly_percentile(metric, start_ms, end_ms, p=95, window_hours=1, store_dir=STORE_DIR):
+    """Rolling ``p``-th percentile per hour: [(hour_start_ms, value, n), ...].
+
+    Each hour that has data gets the percentile over the trailing
+    ``window_hours`` hours (1 = that hour alone).
+    """
+    epochs, values = load_range(start_ms, end_ms, metric, store_dir)
+    if not len(epochs):
+        return []
+    hours = np.unique(epochs // HOUR_MS).tolist() if HAS_NUMPY else sorted({e // HOUR_MS for e in epochs})
+    out = []
+    for h in hours:
+        lo = _search(epochs, (h - window_hours + 1) * HOUR_MS)
+        hi = _search(epochs, (h + 1) * HOUR_MS)
+        window = values[lo:hi]
+        out.append((h * HOUR_MS, round(_percentile(window, p), 1), hi - lo))
+    return out
+
+
+def _summary(values):
+    n = len(values)
+    if not n:
+        return {'n': 0}
+    return {
+        'n': n,
+        'mean': round(float(np.mean(values)) if HAS_NUMPY else sum(values) / n, 1),
+        'p50': round(_percentile(values, 50), 1),
+        'p95': round(_percentile(values, 95), 1),
+    }
+
+
+def compare_around(metric, split_ms, days=7, store_dir=STORE_DIR):
+    """Before/after summary of ``metric`` in equal windows around ``split_ms`` (e.g. a deployment)."""
+    span = days * 24 * HOUR_MS
+    epochs, values = load_range(split_ms - span, split_ms + span, metric, store_dir)
+    cut = _search(epochs, split_ms)
+    before, after = _summary(values[:cut]), _summary(values[cut:])
+    delta = None
+    if before['n'] and after['n']:
+        delta = {k: round(after[k] - before[k], 1) for k in ('mean', 'p50', 'p95')}
+    return {'metric': metric, 'split': split_ms, 'days': days, 'before': before, 'after': after, 'delta': delta}
+
+
+def rebuild(processed_dir=PROJECT_ROOT / 'logs' / 'processed', store_dir=STORE_DIR):
+    """Regenerate the store from every processed day JSON."""
+    total = 0
+    for f in sorted(processed_dir.glob('*.json')):
+        with open(f, 'r', encoding='utf-8') as fh:
+            data = json.load(fh)
+        total += append_interactions(data.get('interactions', []), f.stem, store_dir)
+    return total
+
+
+def parse_local_time(text):
+    """'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' (Israel time) -> epoch ms."""
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(text, fmt).replace(tzinfo=ISRAEL_TZ).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"bad time {text!r}, expected YYYY-MM-DD[ HH:MM]")
+
+
+def _fmt_ms(ms):
+    return datetime.fromtimestamp(ms / 1000, ISRAEL_TZ).strftime('%Y-%m-%d %H:%M')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binary latency time-series store')
+    parser.add_argument('--installation', default=DEFAULT_INSTALLATION)
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('rebuild', help='regenerate the store from logs/processed')
+
+    hourly = sub.add_parser('hourly', help='rolling percentile per hour')
+    hourly.add_argument('--metric', default='latency_ms', choices=METRICS)
+    hourly.add_argument('--p', type=float, default=95)
+    hourly.add_argument('--from', dest='start', type=parse_local_time, required=True)
+    hourly.add_argument('--to', dest='end', type=parse_local_time, required=True)
+    hourly.add_argument('--window', type=int, default=1, help='trailing window in hours')
+
+    compare = sub.add_parser('compare', help='before/after comparison around a point in time')
+    compare.add_argument('--metric', default='latency_ms', choices=METRICS)
+    compare.add_argument('--at', type=parse_local_time, required=True)
+    compare.add_argument('--days', type=int, default=7)
+
+    args = parser.parse_args()
+    partition = Partition(args.installation)
+    store_dir = partition.timeseries_dir
+    if args.cmd == 'rebuild':
+        n = rebuild(partition.processed_dir, store_dir)
+        print(f"Wrote {n} records to {store_dir}")
+    elif args.cmd == 'hourly':
+        # --to is inclusive of that whole day
+        rows = hourly_percentile(args.metric, args.start, args.end + 24 * HOUR_MS, args.p, args.window, store_dir)
+        print(f"{'hour':<17} {'p' + format(args.p, 'g'):>8} {'n':>5}")
+        for hour_ms, value, n in rows:
+            print(f"{_fmt_ms(hour_ms):<17} {value:>8} {n:>5}")
+    elif args.cmd == 'compare':
+        print(json.dumps(compare_around(args.metric, args.at, args.days, store_dir), indent=2))
+
+
+if __name__ == '__main__':
+    main()
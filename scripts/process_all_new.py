@@ -1,39 +1,131 @@
 #!/usr/bin/env python3
-"""Process all unprocessed raw logs, then build accumulated.json."""
+"""Process all unprocessed raw logs, then build accumulated.json.
 
-import subprocess
+    python3 scripts/process_all_new.py [--compact]
+
+Every installation (see installations.py) is processed independently, in
+parallel worker processes; only installations with new logs or compacted days
+are rebuilt, and the cross-installation rollup is merged from their aggregates.
+Older history is compacted into retention tiers (see compact_history.py) only
+when logs/retention.json exists or --compact is given, and only in
+installations with new logs: tiers are counted back from the newest day.
+"""
+
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def report_compaction(moved, installation):
+    """Print what compact_history moved; True if anything changed."""
+    for tier in ('archived', 'rollup'):
+        if moved[tier]:
+            print(f"[{installation}] Compacted {len(moved[tier])} day(s) to {tier}: {', '.join(moved[tier])}")
+    return any(moved.values())
+
+
+def check_rebuild(result):
+    """Print a failed daemon /rebuild; returns [] or ['rebuild'] for the failure list."""
+    if result is not None and 'error' not in result:
+        return []
+    print(f"  - rebuild: {result['error'] if result else 'pipeline daemon stopped responding'}")
+    return ['rebuild']
+
+
+def process_partition(installation, new_files, run_compaction=False):
+    """Process one installation's new logs, compact it if enabled and rebuild its outputs if anything changed."""
+    from build_accumulated import build_partition
+    from compact_history import compact
+    from installations import Partition
+    from process_log import process_single_log
+
+    partition = Partition(installation)
+    for f in new_files:
+        process_single_log(f)
+    compacted = False
+    if run_compaction and new_files:  # tiers only move when the newest day does
+        compacted = report_compaction(compact(partition=partition), installation)
+    stale = not partition.accumulated_path.exists() or not partition.aggregate_path.exists()
+    if new_files or compacted or stale:
+        print(f"\n[{installation}] Rebuilding {partition.accumulated_path.name}...")
+        build_partition(partition)
+        return True
+    return False
+
 
 def main():
     project_root = Path(__file__).parent.parent
     raw_dir = project_root / 'logs' / 'raw'
-    processed_dir = project_root / 'logs' / 'processed'
 
     if not raw_dir.exists():
         print("No logs/raw/ directory found.")
         sys.exit(1)
 
-    processed_dir.mkdir(parents=True, exist_ok=True)
+    from build_accumulated import build_installations_rollup
+    from compact_history import retention_enabled
+    from installations import discover_partitions
+
+    run_compaction = '--compact' in sys.argv[1:] or retention_enabled()
+
+    # Find unprocessed logs per installation; days compacted into rollups count as processed
+    partitions = discover_partitions(project_root)
+    new_files = {p.installation: p.new_files() for p in partitions}
+    total_new = sum(len(files) for files in new_files.values())
 
-    # Find unprocessed logs
-    raw_files = sorted(raw_dir.glob('*.txt'))
-    processed_stems = {f.stem for f in processed_dir.glob('*.json')}
+    # Refresh opening audio durations from the WAV headers before processing
+    from audio_index import sync_audio_durations
+    sync_audio_durations(verbose=True)
 
-    new_files = [f for f in raw_files if f.stem not in processed_stems]
+    # Hand off to a running rambam_pipeline.py daemon if there is one
+    from compact_history import compact
+    from rambam_pipeline import daemon_request
+    if daemon_request('GET', '/status', timeout=2) is not None:
+        print(f"Submitting {total_new} new log file(s) to the running pipeline daemon...")
+        failed = []
+        for p in partitions:
+            for f in new_files[p.installation]:
+                result = daemon_request('POST', '/ingest', {'path': str(f)})
+                if result is None:
+                    print(f"  - {p.installation}/{f.name}: pipeline daemon stopped responding")
+                    sys.exit(1)
+                if 'error' in result:
+                    failed.append(f"{p.installation}/{f.name}")
+                print(f"  - {p.installation}/{f.name}: {result.get('interactions', result.get('error'))}")
+            # Tiers only move with new logs; the daemon reloads from disk if any day moved
+            if run_compaction and new_files[p.installation]:
+                if report_compaction(compact(partition=p), p.installation):
+                    failed += check_rebuild(daemon_request('POST', '/rebuild', {'installation': p.installation}))
+        if not total_new:
+            failed += check_rebuild(daemon_request('POST', '/rebuild', {}))
+        if failed:
+            print(f"\n{len(failed)} daemon request(s) failed: {', '.join(failed)}")
+            sys.exit(1)
+        print("\nDone!")
+        return
 
-    if not new_files:
+    if not total_new:
         print("All logs already processed.")
     else:
-        print(f"Found {len(new_files)} new log file(s) to process:")
-        for f in new_files:
-            print(f"  - {f.name}")
-            subprocess.run([sys.executable, str(project_root / 'scripts' / 'process_log.py'), str(f)], check=True)
-
-    # Always rebuild accumulated
-    print("\nRebuilding accumulated.json...")
-    subprocess.run([sys.executable, str(project_root / 'scripts' / 'build_accumulated.py')], check=True)
+        print(f"Found {total_new} new log file(s) to process:")
+        for p in partitions:
+            for f in new_files[p.installation]:
+                print(f"  - {p.installation}/{f.name}")
+
+    # Installations are independent: one worker process each
+    jobs = [(p.installation, new_files[p.installation], run_compaction) for p in partitions]
+    if len(jobs) == 1:
+        process_partition(*jobs[0])
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(process_partition, *job) for job in jobs]
+            for future in futures:
+                future.result()
+
+    print("\nMerging cross-installation rollup...")
+    build_installations_rollup(project_root)
     print("\nDone!")
 
 
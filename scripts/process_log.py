@@ -12,11 +12,25 @@ from zoneinfo import ZoneInfo
 
 try:
     from deep_translator import GoogleTranslator
-    _translator = GoogleTranslator(source='iw', target='en')
     HAS_TRANSLATOR = True
 except ImportError:
     HAS_TRANSLATOR = False
 
+from installations import DEFAULT_INSTALLATION, Partition, partition_for
+
+# Translator is built on first use, not at import time, so that importing this
+# module (e.g. from the pipeline daemon) stays cheap. Successful translations
+# are memoized for the lifetime of the process.
+_translator = None
+_TRANSLATION_CACHE = {}  # {hebrew_text: english_text}
+
+
+def _get_translator():
+    global _translator
+    if _translator is None:
+        _translator = GoogleTranslator(source='iw', target='en')
+    return _translator
+
 
 def translate_he_to_en(text):
     """Translate Hebrew text to English. Returns empty string on failure."""
@@ -25,25 +39,39 @@ def translate_he_to_en(text):
     # Skip if no Hebrew characters
     if not any('\u0590' <= c <= '\u05FF' for c in text):
         return ''
+    text = text[:2000]  # cap at 2000 chars
+    if text in _TRANSLATION_CACHE:
+        return _TRANSLATION_CACHE[text]
     try:
-        result = _translator.translate(text[:2000])  # cap at 2000 chars
+        result = _get_translator().translate(text)
         _time.sleep(0.15)  # rate limit
-        return result or ''
     except Exception:
         return ''
+    if result:
+        _TRANSLATION_CACHE[text] = result
+    return result or ''
 
 ISRAEL_TZ = ZoneInfo('Asia/Jerusalem')
 
 # Load actual opening audio durations from measured WAV files
-# Falls back to 3000ms estimate if mapping not found
+# (kept in sync by audio_index.py). Falls back to 3000ms estimate if mapping not found
 _AUDIO_DURATIONS_PATH = Path(__file__).parent.parent / 'public' / 'data' / 'audio_durations.json'
 AUDIO_DURATIONS = {}  # {lang_prefix: {audio_id_str: duration_ms}}
 FALLBACK_OPENING_DURATION_MS = 3000
-try:
-    with open(_AUDIO_DURATIONS_PATH) as f:
-        AUDIO_DURATIONS = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError):
-    pass
+
+
+def load_audio_durations():
+    """(Re)load the opening audio duration map from audio_durations.json."""
+    global AUDIO_DURATIONS
+    try:
+        with open(_AUDIO_DURATIONS_PATH) as f:
+            AUDIO_DURATIONS = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        AUDIO_DURATIONS = {}
+    return AUDIO_DURATIONS
+
+
+load_audio_durations()
 
 
 def get_opening_duration_ms(audio_id: str, language: str) -> int:
@@ -254,25 +282,40 @@ def detect_vip(question):
     return None
 
 
+def parse_log_lines(lines, start_line=1):
+    """Parse raw newline-delimited JSON lines into structured entries."""
+    entries = []
+    for line_num, line in enumerate(lines, start_line):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            entry['_line'] = line_num
+            entries.append(entry)
+        except json.JSONDecodeError:
+            continue
+    return entries
+
+
 def parse_log_file(filepath):
     """Parse a raw log file into structured entries."""
-    entries = []
     with open(filepath, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                entry = json.loads(line)
-                entry['_line'] = line_num
-                entries.append(entry)
-            except json.JSONDecodeError:
-                continue
-    return entries
+        return parse_log_lines(f)
+
+
+def _no_translation(text):
+    return ''
+
 
+def group_interactions(entries, translate=True):
+    """Group log entries into complete interactions.
 
-def group_interactions(entries):
-    """Group log entries into complete interactions."""
+    With ``translate=False`` the ``question_en`` / ``answer_en`` of Hebrew
+    text are left empty instead of calling the translator (e.g. follow mode,
+    which only needs latencies).
+    """
+    to_en = translate_he_to_en if translate else _no_translation
     interactions = []
     stt_entries = []
     ai_groups = {}
@@ -446,8 +489,8 @@ def group_interactions(entries):
             'hour': hour,
             'question': question,
             'answer': full_answer,
-            'question_en': question if detect_language(question) == 'en' else translate_he_to_en(question),
-            'answer_en': translate_he_to_en(full_answer) if lang == 'he-IL' else '',
+            'question_en': question if detect_language(question) == 'en' else to_en(question),
+            'answer_en': to_en(full_answer) if lang == 'he-IL' else '',
             'language': lang,
             'question_type': question_type,
             'topic': topic,
@@ -494,7 +537,7 @@ def group_interactions(entries):
                 'hour': parsed_time.hour if parsed_time else 0,
                 'question': question,
                 'answer': '',
-                'question_en': question if detect_language(question) == 'en' else translate_he_to_en(question),
+                'question_en': question if detect_language(question) == 'en' else to_en(question),
                 'answer_en': '',
                 'language': 'unknown',
                 'question_type': 'Greeting' if is_greeting(question) else 'General',
@@ -526,6 +569,8 @@ def group_interactions(entries):
 
 def compute_daily_summary(interactions, date_str):
     """Compute summary stats for a day."""
+    from question_clusters import top_clusters
+
     total = len(interactions)
     if total == 0:
         return {}
@@ -589,55 +634,106 @@ def compute_daily_summary(interactions, date_str):
         ) if think_times else 0,
         'first_interaction': first_time,
         'last_interaction': last_time,
+        'top_question_clusters': top_clusters(interactions),
     }
 
 
-def process_single_log(filepath):
-    """Process a single log file and write processed JSON."""
-    filepath = Path(filepath)
-    if not filepath.exists():
-        print(f"Error: {filepath} not found")
-        sys.exit(1)
-
-    # Extract date from filename
-    stem = filepath.stem  # e.g., '20260215' or '20260222-2'
+def date_from_stem(stem):
+    """Derive YYYY-MM-DD from a log file stem like '20260215' or '20260222-2'."""
     date_part = stem.split('-')[0]  # '20260215'
-    try:
-        date_str = f"{date_part[:4]}-{date_part[4:6]}-{date_part[6:8]}"
-    except (IndexError, ValueError):
-        date_str = 'unknown'
+    if len(date_part) < 8 or not date_part[:8].isdigit():
+        return 'unknown'
+    return f"{date_part[:4]}-{date_part[4:6]}-{date_part[6:8]}"
 
-    print(f"Processing {filepath.name}...")
-    entries = parse_log_file(str(filepath))
+
+def process_entries(entries, stem, filename=None, detector=None, clusters=None,
+                    installation=DEFAULT_INSTALLATION):
+    """Turn parsed raw log entries for one file into the processed-day structure.
+
+    Every interaction is tagged with the ``installation`` it came from.
+
+    If an ``AdaptiveDetector`` is given, its regression codes are added to
+    the fixed-threshold anomalies before the daily summary is computed.
+    If a ``QuestionClusterIndex`` is given, near-duplicate question cluster
+    ids are added to each interaction.
+    """
+    date_str = date_from_stem(stem)
     interactions = group_interactions(entries)
+    if detector is not None:
+        from anomaly_detector import apply_adaptive_anomalies
+        apply_adaptive_anomalies(interactions, detector, stem)
+    if clusters is not None:
+        clusters.cluster_interactions(interactions, stem)
 
-    # Set date on all interactions
+    # Set date and installation on all interactions
     for inter in interactions:
         if not inter['date']:
             inter['date'] = date_str
+        inter['installation'] = installation
 
     summary = compute_daily_summary(interactions, date_str)
 
-    output = {
+    return {
         'date': date_str,
-        'filename': filepath.name,
+        'filename': filename or f"{stem}.txt",
         'summary': summary,
         'interactions': interactions,
     }
 
-    # Write to logs/processed/
-    project_root = Path(__file__).parent.parent
-    out_dir = project_root / 'logs' / 'processed'
+
+def write_processed(output, stem, out_dir=None):
+    """Write a processed day to <out_dir>/<stem>.json (default logs/processed) and return the path."""
+    out_dir = out_dir or Partition().processed_dir
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / f"{stem}.json"
 
     with open(out_path, 'w', encoding='utf-8') as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
+    return out_path
+
 
-    print(f"  → {len(interactions)} interactions → {out_path.name}")
+def process_single_log(filepath):
+    """Process a single log file and write processed JSON."""
+    filepath = Path(filepath)
+    if not filepath.exists():
+        print(f"Error: {filepath} not found")
+        sys.exit(1)
+
+    stem = filepath.stem  # e.g., '20260215' or '20260222-2'
+    # logs/raw/<installation>/<stem>.txt, or the default installation for flat files
+    partition = partition_for(filepath)
+    if partition.is_rolled_up(stem):
+        print(f"Error: {stem} is already compacted into {partition.rollup_dir / (stem + '.json')}")
+        sys.exit(1)
+
+    print(f"Processing {filepath.name} ({partition.installation})...")
+    from anomaly_detector import AdaptiveDetector
+    from question_clusters import QuestionClusterIndex
+    detector = AdaptiveDetector.load(partition.detector_path)
+    clusters = QuestionClusterIndex.load(partition.clusters_path)
+    entries = parse_log_file(str(filepath))
+    output = process_entries(entries, stem, filepath.name, detector, clusters, partition.installation)
+    out_path = write_processed(output, stem, partition.processed_dir)
+    detector.save(partition.detector_path)
+    clusters.save(partition.clusters_path)
+    from latency_store import append_interactions
+    append_interactions(output['interactions'], stem, partition.timeseries_dir)
+
+    print(f"  → {len(output['interactions'])} interactions → {out_path.relative_to(partition.project_root)}")
+    report_missing_audio(output['interactions'])
     return output
 
 
+def report_missing_audio(interactions):
+    """Warn about audio_ids whose duration fell back to the 3000ms estimate."""
+    from audio_index import find_missing_audio_ids, format_missing
+    missing = find_missing_audio_ids(interactions, AUDIO_DURATIONS)
+    if missing:
+        print(f"  ! No audio file for audio_id(s) {format_missing(missing)} "
+              f"— using {FALLBACK_OPENING_DURATION_MS}ms fallback")
+    return missing
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage: python3 process_log.py <log_file.txt>")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Mergeable quantile sketch with bounded relative error (DDSketch-style).
+
+Values are counted in logarithmic buckets: bucket k covers
+(gamma^(k-1), gamma^k] with gamma = (1 + alpha) / (1 - alpha), so every
+quantile is returned within ``alpha`` relative error. Two sketches merge by
+adding bucket counts, which is what lets rollups of compacted days (and of
+separate installations) still answer percentile KPIs.
+"""
+
+import math
+
+DEFAULT_ALPHA = 0.01
+
+
+class QuantileSketch:
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zero = 0
+        self.pos = {}  # {bucket: count} for values > 0
+        self.neg = {}  # {bucket: count} for |values| of values < 0
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key):
+        # Midpoint (in relative terms) of the bucket
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        if value > 0:
+            k = self._key(value)
+            self.pos[k] = self.pos.get(k, 0) + count
+        elif value < 0:
+            k = self._key(-value)
+            self.neg[k] = self.neg.get(k, 0) + count
+        else:
+            self.zero += count
+        self.count += count
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("cannot merge sketches with different alpha")
+        for k, c in other.pos.items():
+            self.pos[k] = self.pos.get(k, 0) + c
+        for k, c in other.neg.items():
+            self.neg[k] = self.neg.get(k, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q in [0, 1], or None if the sketch is empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.neg, reverse=True):
+            seen += self.neg[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zero
+        if seen > rank:
+            return 0
+        for k in sorted(self.pos):
+            seen += self.pos[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.pos)) if self.pos else 0
+
+    def to_dict(self):
+        return {
+            'alpha': self.alpha,
+            'count': self.count,
+            'zero': self.zero,
+            # JSON object keys must be strings
+            'pos': {str(k): c for k, c in sorted(self.pos.items())},
+            'neg': {str(k): c for k, c in sorted(self.neg.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('alpha', DEFAULT_ALPHA))
+        sketch.count = data.get('count', 0)
+        sketch.zero = data.get('zero', 0)
+        sketch.pos = {int(k): c for k, c in data.get('pos', {}).items()}
+        sketch.neg = {int(k): c for k, c in data.get('neg', {}).items()}
+        return sketch
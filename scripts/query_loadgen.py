@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Load generator for query_server.py — reports requests/s and latency percentiles.
+
+    python3 scripts/query_loadgen.py [--url http://127.0.0.1:8766] [--threads 8] [--seconds 10]
+"""
+
+import argparse
+import http.client
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# A dashboard-like mix: KPIs, daily stats, filtered pages, percentiles
+PATHS = [
+    '/api/kpi',
+    '/api/daily',
+    '/api/conversations?page=1&page_size=25',
+    '/api/conversations?page=2&page_size=25',
+    '/api/conversations?language=he-IL&page=1&page_size=25',
+    '/api/conversations?topic=Kashrut,Theology&speed=fast,warning',
+    '/api/conversations?is_anomaly=true&sensitivity=high,critical',
+    '/api/conversations?stop=true',
+    '/api/anomalies?page=1&page_size=50',
+    '/api/anomalies?type=LATENCY_SPIKE_WARN',
+    '/api/percentiles?metric=latency_ms&p=50,95,99',
+    '/api/percentiles?metric=ai_think_ms&language=en-US',
+    '/api/percentiles?metric=opening_latency_ms&speed=slow',
+]
+
+
+def worker(base, deadline, latencies, statuses, lock, gzip_enabled, seed):
+    rng = random.Random(seed)
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    etags = {}
+    local_lat = []
+    local_status = {}
+    while time.perf_counter() < deadline:
+        path = rng.choice(PATHS)
+        headers = {'Accept-Encoding': 'gzip'} if gzip_enabled else {}
+        # Half the time revalidate like a browser holding a cached copy
+        if path in etags and rng.random() < 0.5:
+            headers['If-None-Match'] = etags[path]
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+            local_status['error'] = local_status.get('error', 0) + 1
+            continue
+        local_lat.append((time.perf_counter() - t0) * 1000)
+        local_status[resp.status] = local_status.get(resp.status, 0) + 1
+        if resp.getheader('ETag'):
+            etags[path] = resp.getheader('ETag')
+    conn.close()
+    with lock:
+        latencies.extend(local_lat)
+        for k, v in local_status.items():
+            statuses[k] = statuses.get(k, 0) + v
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8766')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--no-gzip', action='store_true')
+    args = parser.parse_args()
+
+    latencies, statuses, lock = [], {}, threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    threads = [
+        threading.Thread(target=worker, args=(args.url, deadline, latencies, statuses, lock, not args.no_gzip, i))
+        for i in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    n = len(latencies)
+
+    def pct(p):
+        return latencies[min(n - 1, int(n * p / 100))] if n else 0
+
+    print(f"{n} requests in {elapsed:.1f}s with {args.threads} threads")
+    print(f"  throughput: {n / elapsed:,.0f} req/s")
+    print(f"  latency:    p50 {pct(50):.2f}ms  p95 {pct(95):.2f}ms  p99 {pct(99):.2f}ms  max {latencies[-1] if n else 0:.2f}ms")
+    print(f"  status:     {', '.join(f'{k}: {v}' for k, v in sorted(statuses.items(), key=str))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""Local read-only query API over public/data/accumulated.json.
+
+    python3 scripts/query_server.py [port] [installation]    # default http://127.0.0.1:8766
+
+Endpoints (all GET, JSON):
+    /api/kpi                       meta + aggregate KPIs
+    /api/daily?from=&to=           daily_stats in a date range
+    /api/conversations?...         filtered, paginated conversations
+    /api/anomalies?type=&from=&to=&page=&page_size=
+    /api/percentiles?metric=latency_ms&p=50,95,99&...
+    /api/answer?source=20260215.json&id=...   answer text, incl. archived days
+    /api/health
+
+Conversation filters use the facet bitmap index (facet_index.py): topic,
+language, sensitivity, speed, anomaly, is_anomaly, stop — comma-separated
+values are OR-ed, facets are AND-ed — plus from/to dates.
+
+Responses are cached in an LRU keyed by the request, with an ETag for
+conditional GETs and gzip when the client accepts it. The data is reloaded
+and the cache cleared whenever accumulated.json changes on disk, i.e. after
+every ingest.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from compact_history import fetch_archived_answer  # noqa: E402
+from facet_index import (  # noqa: E402
+    FACETS, bitmap_from_ordinals, build_facet_index, decode_facet_index, ordinals, query,
+)
+from installations import DEFAULT_INSTALLATION, Partition  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_PATH = PROJECT_ROOT / 'public' / 'data' / 'accumulated.json'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8766
+CACHE_SIZE = 512
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+GZIP_MIN_BYTES = 1024
+PERCENTILE_METRICS = ['latency_ms', 'opening_latency_ms', 'ai_think_ms', 'stream_duration_ms', 'net_gap_ms']
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class NotFound(LookupError):
+    pass
+
+
+class LRUCache:
+    """Thread-safe LRU of rendered responses."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class Snapshot:
+    """One consistent version of the accumulated data plus its indexes."""
+
+    def __init__(self, version=None, accumulated=None, archive_dir=None):
+        self.version = version
+        self.accumulated = accumulated or {}
+        self.archive_dir = archive_dir
+        self.conversations = self.accumulated.get('conversations', [])
+        encoded = self.accumulated.get('facet_index')
+        self.index = decode_facet_index(encoded) if encoded else build_facet_index(self.conversations)
+        members = {}
+        for i, conv in enumerate(self.conversations):
+            members.setdefault(conv.get('date', ''), []).append(i)
+        self.dates = {date: bitmap_from_ordinals(ords) for date, ords in members.items()}  # {date: bitmap}
+
+    def select(self, params):
+        """Bitmap of conversations matching facet + date filters."""
+        filters = {}
+        for facet in FACETS:
+            if facet in params:
+                filters[facet] = [v for v in params[facet].split(',') if v]
+        bits = query(self.index, len(self.conversations), filters)
+        date_from, date_to = params.get('from'), params.get('to')
+        if date_from or date_to:
+            date_bits = 0
+            for date, b in self.dates.items():
+                if (not date_from or date >= date_from) and (not date_to or date <= date_to):
+                    date_bits |= b
+            bits &= date_bits
+        return bits
+
+
+class QueryData:
+    """Current Snapshot of accumulated.json, replaced when the file changes."""
+
+    def __init__(self, path=DATA_PATH, cache=None, archive_dir=None):
+        self.path = Path(path)
+        self.archive_dir = archive_dir or Partition().archive_dir
+        self.cache = cache or LRUCache()
+        self.lock = threading.Lock()
+        self.snapshot = Snapshot(archive_dir=self.archive_dir)
+        self.refresh()
+
+    def refresh(self):
+        """Return the current snapshot, reloading first if accumulated.json changed.
+
+        Raises OSError / ValueError if the file cannot be loaded; the old
+        snapshot stays in place and the next request retries.
+        """
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return self.snapshot
+        version = (st.st_mtime_ns, st.st_size)
+        snapshot = self.snapshot
+        if version == snapshot.version:
+            return snapshot
+        with self.lock:
+            if version == self.snapshot.version:
+                return self.snapshot
+            with open(self.path, 'r', encoding='utf-8') as f:
+                accumulated = json.load(f)
+            self.snapshot = Snapshot(version, accumulated, self.archive_dir)
+            self.cache.clear()  # old entries are unreachable anyway: keys carry the version
+            return self.snapshot
+
+
+def _int_param(params, name, default, lo=1, hi=None):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if value < lo:
+        raise BadRequest(f"{name} must be at least {lo}")
+    if hi is not None and value > hi:
+        raise BadRequest(f"{name} must be at most {hi}")
+    return value
+
+
+def _paginate(items_or_ordinals, params):
+    page = _int_param(params, 'page', 1)
+    page_size = _int_param(params, 'page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    start = (page - 1) * page_size
+    return page, page_size, items_or_ordinals[start:start + page_size]
+
+
+def percentile(sorted_values, p):
+    """Linear-interpolated percentile of pre-sorted values."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return round(sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo), 1)
+
+
+def handle_kpi(data, params):
+    return {'meta': data.accumulated.get('meta', {}), 'kpi': data.accumulated.get('kpi', {})}
+
+
+def handle_daily(data, params):
+    date_from, date_to = params.get('from'), params.get('to')
+    return {'daily_stats': [
+        d for d in data.accumulated.get('daily_stats', [])
+        if (not date_from or d.get('date', '') >= date_from) and (not date_to or d.get('date', '') <= date_to)
+    ]}
+
+
+def handle_conversations(data, params):
+    matches = ordinals(data.select(params))
+    if params.get('order', 'desc') == 'desc':
+        matches.reverse()
+    page, page_size, page_ordinals = _paginate(matches, params)
+    return {
+        'total': len(matches),
+        'page': page,
+        'page_size': page_size,
+        'items': [data.conversations[i] for i in page_ordinals],
+    }
+
+
+def handle_anomalies(data, params):
+    types = {t for t in params.get('type', '').split(',') if t}
+    date_from, date_to = params.get('from'), params.get('to')
+    items = [
+        a for a in data.accumulated.get('anomaly_log', [])
+        if (not types or a.get('type') in types)
+        and (not date_from or a.get('date', '') >= date_from)
+        and (not date_to or a.get('date', '') <= date_to)
+    ]
+    counts = {}
+    for a in items:
+        counts[a['type']] = counts.get(a['type'], 0) + 1
+    page, page_size, page_items = _paginate(items, params)
+    return {'total': len(items), 'counts': counts, 'page': page, 'page_size': page_size, 'items': page_items}
+
+
+def handle_percentiles(data, params):
+    metric = params.get('metric', 'latency_ms')
+    if metric not in PERCENTILE_METRICS:
+        raise BadRequest(f"metric must be one of {', '.join(PERCENTILE_METRICS)}")
+    try:
+        ps = [float(p) for p in params.get('p', '50,90,95,99').split(',') if p]
+    except ValueError:
+        raise BadRequest("p must be a comma-separated list of numbers")
+    if any(not math.isfinite(p) or p < 0 or p > 100 for p in ps):
+        raise BadRequest("p must be between 0 and 100")
+    # net_gap_ms is signed; the latency components only count when measured (> 0)
+    values = []
+    for i in ordinals(data.select(params)):
+        v = data.conversations[i].get(metric)
+        if v is not None and (metric == 'net_gap_ms' or v > 0):
+            values.append(v)
+    values.sort()
+    return {
+        'metric': metric,
+        'n': len(values),
+        'percentiles': {f"p{p:g}": percentile(values, p) for p in ps},
+    }
+
+
+def handle_answer(data, params):
+    """Answer text for one conversation; archived days are read from logs/archive."""
+    source, conv_id = params.get('source'), params.get('id')
+    if not source or not conv_id:
+        raise BadRequest("source and id are required")
+    archived = fetch_archived_answer(source, conv_id, data.archive_dir)
+    if archived is not None:
+        return dict(archived, id=conv_id, source=source, archived=True)
+    for conv in data.conversations:
+        if conv.get('id') == conv_id and conv.get('_source_file') in (source, f"{source}.json"):
+            return {'id': conv_id, 'source': source, 'archived': False,
+                    'answer': conv.get('answer', ''), 'answer_en': conv.get('answer_en', '')}
+    raise NotFound(f"no answer for {source} / {conv_id}")
+
+
+ROUTES = {
+    '/api/kpi': handle_kpi,
+    '/api/daily': handle_daily,
+    '/api/conversations': handle_conversations,
+    '/api/anomalies': handle_anomalies,
+    '/api/percentiles': handle_percentiles,
+    '/api/answer': handle_answer,
+}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive for load testing
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    data = None  # set by serve()
+
+    def _send(self, status, body=b'', etag=None, gzipped=None, head_only=False):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Vary', 'Accept-Encoding')
+        if etag:
+            self.send_header('ETag', etag)
+        if gzipped is not None:
+            body = gzipped
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _send_error_json(self, status, message):
+        self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def do_GET(self, head_only=False):
+        parts = urlsplit(self.path)
+        cache = self.data.cache
+        try:
+            # One snapshot per request, so a concurrent reload cannot mix versions
+            snapshot = self.data.refresh()
+        except (OSError, ValueError) as e:
+            self._send_error_json(500, f"could not load {self.data.path.name}: {e}")
+            return
+
+        if parts.path == '/api/health':
+            self._send(200, json.dumps({
+                'conversations': len(snapshot.conversations),
+                'cache_entries': len(cache.items),
+                'cache_hits': cache.hits,
+                'cache_misses': cache.misses,
+            }).encode('utf-8'), head_only=head_only)
+            return
+
+        handler = ROUTES.get(parts.path)
+        if handler is None:
+            self._send_error_json(404, f"unknown path {parts.path}")
+            return
+
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        key = (snapshot.version, parts.path, tuple(sorted(params.items())))
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                payload = handler(snapshot, params)
+            except BadRequest as e:
+                self._send_error_json(400, str(e))
+                return
+            except NotFound as e:
+                self._send_error_json(404, str(e))
+                return
+            except Exception as e:
+                self._send_error_json(500, f"{type(e).__name__}: {e}")
+                return
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()[:20]
+            gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+            # The gzip body is a different representation, so it gets its own strong ETag
+            entry = (body, f'"{etag}"', gzipped, f'"{etag}-gz"')
+            cache.put(key, entry)
+        body, etag, gzipped, gzip_etag = entry
+        if gzipped is None or 'gzip' not in self.headers.get('Accept-Encoding', ''):
+            gzipped = None
+        else:
+            etag = gzip_etag
+
+        if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send(200, body, etag, gzipped, head_only)
+
+    def do_HEAD(self):
+        self.do_GET(head_only=True)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, installation=DEFAULT_INSTALLATION):
+    partition = Partition(installation)
+    QueryHandler.data = QueryData(partition.accumulated_path, archive_dir=partition.archive_dir)
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    print(f"Query API for {installation} on http://{host}:{port} "
+          f"({len(QueryHandler.data.snapshot.conversations)} conversations)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT,
+          installation=sys.argv[2] if len(sys.argv) > 2 else DEFAULT_INSTALLATION)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Near-duplicate question clustering with MinHash + LSH banding.
+
+Visitors ask the same thing in many phrasings, transliterations and STT
+misspellings. Questions are normalized (Hebrew niqqud/final letters, Latin
+diacritics, punctuation), shingled into character 3-grams and reduced to a
+MinHash signature. LSH banding finds candidate clusters in roughly constant
+time per question, so clustering is linear in the number of questions and
+new days join existing clusters without reclustering history.
+
+The index persists in logs/state/question_clusters.json.
+
+    python3 scripts/question_clusters.py        # show the largest clusters
+"""
+
+import json
+import random
+import re
+import sys
+import unicodedata
+import zlib
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+STATE_PATH = PROJECT_ROOT / 'logs' / 'state' / 'question_clusters.json'
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16            # 16 bands x 4 rows -> LSH threshold around Jaccard 0.5
+ROWS = NUM_PERM // BANDS
+SIM_THRESHOLD = 0.4   # min estimated Jaccard with a cluster's representative
+MIN_CHARS = 8         # shorter questions carry too little signal to cluster
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20260215)  # fixed seed: signatures must be stable across runs
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERM)]
+
+_HEBREW_FINALS = str.maketrans('\u05DA\u05DD\u05DF\u05E3\u05E5', '\u05DB\u05DE\u05E0\u05E4\u05E6')  # ךםןףץ -> כמנפצ
+_NIQQUD_RE = re.compile('[\u0591-\u05C7]')
+_NON_WORD_RE = re.compile(r'\W+')
+# Forms of address carry no meaning ("Rambam, what is...") — compared after normalization
+_ADDRESS_WORDS = {'rambam', 'רמבמ', 'הרמבמ'}
+# Nor do leading greetings ("שלום הרמב״ם, כמה שעות..."); matched as normalized word sequences
+_GREETING_PREFIXES = [tuple(p.split()) for p in (
+    'בוקר טוב', 'ערב טוב', 'צהריימ טובימ', 'לילה טוב', 'תודה רבה', 'שלומ', 'היי', 'הי', 'תודה',
+    'good morning', 'good afternoon', 'good evening', 'thank you', 'hello', 'hey', 'hi', 'thanks',
+)]
+
+
+def normalize_question(text):
+    """Normalize Hebrew + Latin text so phrasing/STT variants compare equal."""
+    text = _NIQQUD_RE.sub('', text.lower()).translate(_HEBREW_FINALS)
+    # Strip Latin diacritics (e.g. STT's "šatyta" -> "satyta")
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    # Drop gershayim/geresh and apostrophes inside words (רמב״ם, k'zeh)
+    text = re.sub('[\u05F3\u05F4\'"]', '', text)
+    text = _NON_WORD_RE.sub(' ', text).replace('_', ' ')
+    words = [w for w in text.split() if w not in _ADDRESS_WORDS]
+    stripped = True
+    while stripped:
+        stripped = False
+        for prefix in _GREETING_PREFIXES:
+            if tuple(words[:len(prefix)]) == prefix:
+                words = words[len(prefix):]
+                stripped = True
+                break
+    return ' '.join(words)
+
+
+def shingles(text):
+    padded = f" {text} "
+    return {padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingle_set):
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingle_set]
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature):
+    return [f"{b}:{zlib.crc32(repr(signature[b * ROWS:(b + 1) * ROWS]).encode()):08x}"
+            for b in range(BANDS)]
+
+
+def estimate_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def assignment_key(inter):
+    """Stable key of an interaction's question: its STT line (time + text).
+
+    Interaction ids are not stable while a day grows: an orphan STT's
+    ``orphan_N`` id becomes the AI message id once its reply arrives.
+    """
+    return f"{inter.get('time', '')}|{inter['question']}"
+
+
+class QuestionClusterIndex:
+    """Persistent MinHash/LSH cluster index."""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.buckets = state.get('buckets', {})    # {band_key: cluster_id}
+        self.clusters = state.get('clusters', {})  # {cluster_id: {size, label, signature, first_seen}}
+        self.assigned = state.get('assigned', {})  # {source: {assignment_key(): cluster_id}}
+        self.next_id = state.get('next_id', 1)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls()
+
+    def save(self, path=STATE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'next_id': self.next_id,
+                'clusters': self.clusters,
+                'buckets': self.buckets,
+                'assigned': self.assigned,
+            }, f, ensure_ascii=False)
+
+    def assign(self, question, date=''):
+        """Return the cluster id for a question, creating a cluster if needed."""
+        normalized = normalize_question(question)
+        if len(normalized) < MIN_CHARS:
+            return None
+        signature = minhash_signature(shingles(normalized))
+        keys = band_keys(signature)
+
+        best_id, best_sim = None, SIM_THRESHOLD
+        for cid in {self.buckets[k] for k in keys if k in self.buckets}:
+            sim = estimate_similarity(signature, self.clusters[cid]['signature'])
+            if sim >= best_sim:
+                best_id, best_sim = cid, sim
+
+        if best_id is None:
+            best_id = str(self.next_id)
+            self.next_id += 1
+            self.clusters[best_id] = {'size': 0, 'label': question[:80], 'signature': signature, 'first_seen': date}
+        self.clusters[best_id]['size'] += 1
+        # Register this member's bands too, so later variants of it find the cluster
+        for k in keys:
+            self.buckets.setdefault(k, best_id)
+        return best_id
+
+    def sizes(self):
+        """{cluster_id: members ever assigned} — the one definition of cluster_size."""
+        return {cid: c['size'] for cid, c in self.clusters.items()}
+
+    def cluster_interactions(self, interactions, source):
+        """Set cluster_id on interactions, assigning each question of a source once.
+
+        cluster_size is not stored per day (it would go stale as later days
+        join the cluster); build_accumulated.py sets it from ``sizes()``.
+        """
+        seen = self.assigned.setdefault(source, {})
+        for inter in interactions:
+            if not inter.get('question'):
+                inter['cluster_id'] = None
+                continue
+            key = assignment_key(inter)
+            if key not in seen:
+                inter_id = inter.get('id', '')
+                if inter_id in seen and not inter_id.startswith('orphan_'):
+                    # State saved before assignments were keyed by STT line
+                    seen[key] = seen.pop(inter_id)
+                else:
+                    # Greetings normalize to (almost) nothing and fall under MIN_CHARS
+                    seen[key] = self.assign(inter['question'], inter.get('date', ''))
+            inter['cluster_id'] = seen[key]
+        return interactions
+
+
+def top_clusters(interactions, limit=5):
+    """Most-asked question clusters in a set of interactions."""
+    counts = {}
+    labels = {}
+    for inter in interactions:
+        cid = inter.get('cluster_id')
+        if not cid:
+            continue
+        counts[cid] = counts.get(cid, 0) + 1
+        labels.setdefault(cid, inter.get('question_en') or inter.get('question', ''))
+    ranked = sorted(counts.items(), key=lambda kv: (-kv[1], int(kv[0])))
+    return [{'cluster_id': cid, 'count': n, 'label': labels[cid][:80]}
+            for cid, n in ranked[:limit] if n > 1]
+
+
+def main():
+    index = QuestionClusterIndex.load()
+    if not index.clusters:
+        print("No question clusters yet. Process some logs first.")
+        sys.exit(1)
+    ranked = sorted(index.clusters.items(), key=lambda kv: -kv[1]['size'])
+    print(f"{len(index.clusters)} clusters")
+    for cid, c in ranked[:20]:
+        print(f"  #{cid:<5} x{c['size']:<4} {c['label']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""Long-running ingestion daemon with warm caches, plus a thin CLI client.
+
+    python3 scripts/rambam_pipeline.py serve            # start the daemon
+    python3 scripts/rambam_pipeline.py ingest FILE...   # submit raw log files
+    python3 scripts/rambam_pipeline.py rebuild          # reload processed/ and republish
+    python3 scripts/rambam_pipeline.py status
+
+The daemon listens on localhost HTTP and keeps the parser, classifiers,
+translation cache, adaptive anomaly detector, question cluster index and
+every processed day resident, per installation (see installations.py).
+Submitting a day only re-processes that day, re-assembles that installation's
+accumulated.json from memory and re-merges the cross-installation rollup.
+If no daemon is running, `ingest` and `rebuild` fall back to the
+in-process (cold start) pipeline.
+"""
+
+import http.client
+import json
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import process_log  # noqa: E402
+from anomaly_detector import AdaptiveDetector  # noqa: E402
+from audio_index import find_missing_audio_ids, format_missing, sync_audio_durations  # noqa: E402
+from build_accumulated import (  # noqa: E402
+    assemble_accumulated, build_installations_rollup, load_processed_days, load_rollups,
+    write_accumulated, write_partition_aggregate,
+)
+from facet_index import evict_source  # noqa: E402
+from installations import DEFAULT_INSTALLATION, Partition, discover_partitions, partition_for  # noqa: E402
+from latency_store import append_interactions  # noqa: E402
+from question_clusters import QuestionClusterIndex  # noqa: E402
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+STEM_RE = re.compile(r'^\d{8}(-\d+)?$')  # YYYYMMDD[-N], see docs/LOG_INGESTION_PIPELINE.md
+
+
+def validate_stem(stem):
+    if not isinstance(stem, str) or not STEM_RE.match(stem):
+        raise ValueError(f"bad log stem {stem!r}: expected YYYYMMDD or YYYYMMDD-N")
+    return stem
+
+
+class PipelineState:
+    """Resident pipeline state of one installation partition."""
+
+    def __init__(self, partition):
+        self.partition = partition
+        self.installation = partition.installation
+        self.raw_dir = partition.raw_dir
+        self.processed_dir = partition.processed_dir
+        self.rollup_dir = partition.rollup_dir
+        self.out_path = partition.accumulated_path
+        self.lock = threading.Lock()
+        self.days = {}         # {processed filename: processed day dict}
+        self.rollups = []      # compacted days, see compact_history.py
+        self.raw_entries = {}  # {stem: parsed raw entries}, only for stems with line submissions
+        self.raw_lines = {}    # {stem: number of raw lines seen}
+        self.detector = None
+        self.clusters = None
+        self.facet_cache = {}  # per-day facet bitmap blocks, see facet_index.py
+        self.counts = {}       # status() snapshot, replaced after every change
+        self.reload()
+
+    def reload(self):
+        """Reload all processed days and rollups from disk."""
+        self.processed_dir.mkdir(parents=True, exist_ok=True)
+        self.days = dict(load_processed_days(self.processed_dir))
+        self.rollups = load_rollups(self.rollup_dir)
+        # compact_history.py prunes state for rolled-up days on disk
+        self.detector = AdaptiveDetector.load(self.partition.detector_path)
+        self.clusters = QuestionClusterIndex.load(self.partition.clusters_path)
+        self.raw_entries.clear()
+        self.raw_lines.clear()
+        self.facet_cache.clear()
+        self._update_counts()
+
+    def _update_counts(self):
+        self.counts = {
+            'days': len(self.days),
+            'rollup_days': len(self.rollups),
+            'conversations': sum(len(d.get('interactions', [])) for d in self.days.values()),
+        }
+
+    def publish(self):
+        """Re-assemble this installation's accumulated.json from the in-memory days."""
+        if not self.days and not self.rollups:
+            return {'installation': self.installation, 'total_days': 0}
+        accumulated, aggregate = assemble_accumulated(sorted(self.days.items()), self.facet_cache,
+                                                      self.rollups, self.installation, self.clusters.sizes())
+        write_accumulated(accumulated, self.out_path)
+        write_partition_aggregate(accumulated, aggregate, self.partition.aggregate_path)
+        return accumulated['meta']
+
+    def _check_not_rolled_up(self, stem):
+        # Its processed day and detector / cluster state are gone; reprocessing would count it twice
+        if self.partition.is_rolled_up(stem):
+            raise ValueError(f"{stem} is compacted into {self.rollup_dir}/{stem}.json and cannot be re-ingested")
+
+    def _load_raw(self, stem):
+        raw_path = self.raw_dir / f"{stem}.txt"
+        if stem not in self.raw_entries:
+            lines = raw_path.read_text(encoding='utf-8').splitlines() if raw_path.exists() else []
+            self.raw_entries[stem] = process_log.parse_log_lines(lines)
+            self.raw_lines[stem] = len(lines)
+        return raw_path
+
+    def _process_stem(self, stem, filename, entries):
+        # Header scan is cached by (size, mtime), so this is cheap per ingest
+        sync_audio_durations()
+        process_log.load_audio_durations()
+        output = process_log.process_entries(entries, stem, filename,
+                                             self.detector, self.clusters, self.installation)
+        process_log.write_processed(output, stem, self.processed_dir)
+        self.detector.save(self.partition.detector_path)
+        self.clusters.save(self.partition.clusters_path)
+        append_interactions(output['interactions'], stem, self.partition.timeseries_dir)
+        self.days[f"{stem}.json"] = output
+        evict_source(self.facet_cache, f"{stem}.json")
+        self._update_counts()
+        return output
+
+    def ingest_file(self, path):
+        """Process a whole raw log file from this installation's raw dir and republish."""
+        path = Path(path).resolve()
+        if path.parent != self.raw_dir.resolve() or path.suffix != '.txt':
+            raise ValueError(f"{path} is not a raw log of installation {self.installation} "
+                             f"({self.raw_dir}/YYYYMMDD.txt)")
+        stem = validate_stem(path.stem)
+        self._check_not_rolled_up(stem)
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found")
+        entries = process_log.parse_log_lines(path.read_text(encoding='utf-8').splitlines())
+        with self.lock:
+            # Whole-file days are not kept parsed; a later line submission re-reads the file
+            self.raw_entries.pop(stem, None)
+            self.raw_lines.pop(stem, None)
+            output = self._process_stem(stem, path.name, entries)
+            meta = self.publish()
+        return self._result(stem, output, meta)
+
+    def _result(self, stem, output, meta):
+        return {
+            'installation': self.installation,
+            'stem': stem,
+            'interactions': len(output['interactions']),
+            'missing_audio_ids': find_missing_audio_ids(output['interactions'], process_log.AUDIO_DURATIONS),
+            'meta': meta,
+        }
+
+    def ingest_lines(self, stem, lines):
+        """Append raw lines to <raw dir>/<stem>.txt, reprocess that day and republish."""
+        validate_stem(stem)
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            raise ValueError("lines must be a list of strings")
+        self._check_not_rolled_up(stem)
+        lines = [line for line in lines if line.strip()]
+        with self.lock:
+            raw_path = self._load_raw(stem)
+            start = self.raw_lines[stem] + 1
+            self.raw_entries[stem].extend(process_log.parse_log_lines(lines, start))
+            self.raw_lines[stem] += len(lines)
+            raw_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(raw_path, 'a', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(line.rstrip('\n') + '\n')
+            output = self._process_stem(stem, raw_path.name, self.raw_entries[stem])
+            meta = self.publish()
+        return self._result(stem, output, meta)
+
+    def rebuild(self):
+        with self.lock:
+            self.reload()
+            meta = self.publish()
+        return {'meta': meta}
+
+    def status(self):
+        # Never waits on self.lock: an ingest (with translation) can hold it for seconds
+        return self.counts
+
+
+class Pipeline:
+    """All installation partitions, plus the cross-installation rollup."""
+
+    def __init__(self, project_root):
+        self.project_root = Path(project_root)
+        self.started = time.time()
+        self.lock = threading.Lock()         # guards self.states
+        self.rollup_lock = threading.Lock()  # serializes installations.json writes
+        self.states = {p.installation: PipelineState(p) for p in discover_partitions(self.project_root)}
+
+    def state(self, installation):
+        with self.lock:
+            if installation not in self.states:
+                self.states[installation] = PipelineState(Partition(installation, self.project_root))
+            return self.states[installation]
+
+    def _publish_rollup(self, result):
+        with self.rollup_lock:
+            build_installations_rollup(self.project_root)
+        return result
+
+    def ingest_file(self, path):
+        if not isinstance(path, str):
+            raise ValueError("path must be a string")
+        state = self.state(partition_for(path, self.project_root).installation)
+        return self._publish_rollup(state.ingest_file(path))
+
+    def ingest_lines(self, stem, lines, installation=DEFAULT_INSTALLATION):
+        return self._publish_rollup(self.state(installation).ingest_lines(stem, lines))
+
+    def rebuild(self, installation=None):
+        if installation:
+            states = [self.state(installation)]
+        else:
+            # Pick up installations whose first logs arrived since startup
+            states = [self.state(p.installation) for p in discover_partitions(self.project_root)]
+        return self._publish_rollup({'meta': {s.installation: s.rebuild()['meta'] for s in states}})
+
+    def status(self):
+        with self.lock:
+            states = dict(self.states)
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'translation_cache': len(process_log._TRANSLATION_CACHE),
+            'installations': {name: s.status() for name, s in sorted(states.items())},
+        }
+
+
+class PipelineHandler(BaseHTTPRequestHandler):
+    pipeline = None  # set by serve()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._send_json(200, self.pipeline.status())
+        else:
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        t0 = time.perf_counter()
+        # Only JSON: browsers can send text/plain cross-origin without a preflight
+        if self.headers.get_content_type() != 'application/json':
+            self._send_json(415, {'error': "Content-Type must be application/json"})
+            return
+        try:
+            body = self._read_json()
+            if self.path == '/ingest':
+                if 'path' in body:
+                    result = self.pipeline.ingest_file(body['path'])
+                elif 'stem' in body and 'lines' in body:
+                    result = self.pipeline.ingest_lines(body['stem'], body['lines'],
+                                                        body.get('installation', DEFAULT_INSTALLATION))
+                else:
+                    self._send_json(400, {'error': "expected 'path' or 'stem' + 'lines'"})
+                    return
+            elif self.path == '/rebuild':
+                result = self.pipeline.rebuild(body.get('installation'))
+            else:
+                self._send_json(404, {'error': f"unknown path {self.path}"})
+                return
+        except FileNotFoundError as e:
+            self._send_json(404, {'error': str(e)})
+            return
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        result['elapsed_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+        self._send_json(200, result)
+
+    def log_message(self, fmt, *args):
+        print(f"[rambam-pipeline] {self.address_string()} {fmt % args}")
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    project_root = Path(__file__).parent.parent
+    pipeline = PipelineHandler.pipeline = Pipeline(project_root)
+    server = ThreadingHTTPServer((host, port), PipelineHandler)
+    days = sum(len(s.days) for s in pipeline.states.values())
+    print(f"rambam-pipeline listening on http://{host}:{port} "
+          f"({days} days loaded, {len(pipeline.states)} installation(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+
+
+def daemon_request(method, path, payload=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=300):
+    """Send a request to a running daemon. Returns None if no daemon is listening.
+
+    A daemon that accepts the connection but fails to answer, or does not
+    answer within ``timeout`` seconds, yields an ``{'error': ...}`` dict, so
+    it is never mistaken for "no daemon".
+    """
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read().decode('utf-8'))
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, TimeoutError):
+            return {'error': f"pipeline daemon did not answer within {timeout}s"}
+        # Connection refused / unreachable: nothing is listening
+        return None
+    except TimeoutError:
+        return {'error': f"pipeline daemon did not answer within {timeout}s"}
+    except (OSError, http.client.HTTPException) as e:
+        return {'error': f"pipeline daemon closed the connection: {e}"}
+
+
+def main(argv):
+    if not argv or argv[0] not in ('serve', 'ingest', 'rebuild', 'status'):
+        print(__doc__)
+        sys.exit(1)
+    cmd, args = argv[0], argv[1:]
+
+    if cmd == 'serve':
+        port = int(args[0]) if args else DEFAULT_PORT
+        serve(port=port)
+        return
+
+    if cmd == 'status':
+        result = daemon_request('GET', '/status', timeout=5)
+        print(json.dumps(result, indent=2) if result else "No daemon running.")
+        return
+
+    if cmd == 'rebuild':
+        result = daemon_request('POST', '/rebuild', {})
+        if result is None:
+            from build_accumulated import build_accumulated
+            build_accumulated()
+        else:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    if not args:
+        print("Usage: python3 rambam_pipeline.py ingest <log_file.txt>...")
+        sys.exit(1)
+    for arg in args:
+        path = str(Path(arg).resolve())
+        result = daemon_request('POST', '/ingest', {'path': path})
+        if result is None:
+            print("No daemon running — processing in-process.")
+            for f in args:
+                process_log.process_single_log(f)
+            from build_accumulated import build_accumulated
+            build_accumulated(sorted({partition_for(f).installation for f in args}))
+            return
+        if 'error' in result:
+            print(f"Error: {result['error']}")
+            sys.exit(1)
+        print(f"  {result['installation']}/{Path(arg).name}: {result['interactions']} interactions "
+              f"({result['elapsed_ms']}ms)")
+        if result.get('missing_audio_ids'):
+            print(f"  ! No audio file for audio_id(s) {format_missing(result['missing_audio_ids'])}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -17,6 +17,9 @@ const ANOMALY_EXPLANATIONS: Record<string, string> = {
   'OPENING_LATENCY_WARN': 'Visitor waited over 3 seconds before hearing anything',
   'OPENING_LATENCY_CRITICAL': 'Visitor waited over 5 seconds before hearing anything — very uncomfortable',
   'STT_DROPPED': 'Speech was recognized but the system never responded',
+  'LATENCY_REGRESSION': 'Response was much slower than usual for this language, time of day and question type',
+  'OPENING_LATENCY_REGRESSION': 'Visitor waited much longer than usual before hearing anything, for this language, time of day and question type',
+  'THINK_REGRESSION': 'AI took much longer to think than usual for this language, time of day and question type',
 }
 
 const SENSITIVITY_EXPLANATIONS: Record<string, string> = {
@@ -168,11 +171,13 @@ export function ConversationCard({
 
           {/* Full answer */}
           <div dir={isHebrew ? 'rtl' : 'ltr'} className={`text-base text-parchment leading-relaxed ${isHebrew ? 'font-hebrew' : ''}`}>
-            {c.answer || <span className="text-critical italic">No answer generated</span>}
+            {c.answer || (c.answer_archived
+              ? <span className="text-text-dim italic" title="Older days are compacted; the answer text is served by the query API (/api/answer)">Answer archived</span>
+              : <span className="text-critical italic">No answer generated</span>)}
           </div>
 
           {/* Answer translation */}
-          {showTranslations && isHebrew && (
+          {showTranslations && isHebrew && !c.answer_archived && (
             c.answer_en ? (
               <div className="translation-text text-base mt-2">
                 ┈ {c.answer_en}
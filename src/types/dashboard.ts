@@ -5,6 +5,34 @@ export interface AccumulatedData {
   topic_trend: TopicTrend[]
   anomaly_log: AnomalyEntry[]
   conversations: Conversation[]
+  facet_index?: FacetIndex
+}
+
+// Bitmap per facet value over conversation ordinals, run-length encoded as
+// [start, length, start, length, ...] (see scripts/facet_index.py)
+export interface FacetIndex {
+  size: number
+  encoding: 'runs'
+  facets: Record<string, Record<string, { count: number; runs: number[] }>>
+}
+
+// public/data/installations.json — KPIs per installation plus the merged
+// cross-installation rollup (see scripts/installations.py)
+export interface InstallationsRollup {
+  meta: {
+    last_updated: string
+    installations: string[]
+    total_days: number
+    total_conversations: number
+    date_range: [string, string] | []
+  }
+  kpi: KPI
+  installations: Record<string, {
+    total_days: number
+    date_range: [string, string] | []
+    last_updated: string
+    kpi: KPI
+  }>
 }
 
 export interface Meta {
@@ -13,6 +41,9 @@ export interface Meta {
   total_conversations: number
   date_range: [string, string]
   generated_by: string
+  installation?: string
+  // Days per retention tier (see scripts/compact_history.py)
+  tiers?: { full: number; archived: number; rollup: number }
 }
 
 export interface KPI {
@@ -31,6 +62,8 @@ export interface KPI {
   failure_rate: number
   language_distribution: Record<string, number>
   topic_distribution: Record<string, number>
+  // Sketch-based percentiles, computed across all retention tiers
+  latency_percentiles?: Record<string, { p50: number | null; p95: number | null; p99: number | null }>
 }
 
 export interface DailyStat {
@@ -55,6 +88,13 @@ export interface DailyStat {
   seamless_rate: number
   first_interaction: string
   last_interaction: string
+  top_question_clusters?: QuestionCluster[]
+}
+
+export interface QuestionCluster {
+  cluster_id: string
+  count: number
+  label: string
 }
 
 export interface TopicTrend {
@@ -107,6 +147,11 @@ export interface Conversation {
   sensitivity: string
   vip: string | null
   needs_translation: boolean
+  cluster_id?: string | null
+  cluster_size?: number
+  installation?: string
+  // answer / answer_en moved to logs/archive; fetch via /api/answer
+  answer_archived?: boolean
 }
 
 // Color constants